@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Group, Post
+from .models import Follow, Group, Post
 
 empty_value_display_constant = "-пусто-"
 
@@ -18,3 +18,9 @@ class GroupAdmin(admin.ModelAdmin):
     list_display = ("pk", "title", "slug", "description")
     search_fields = ("title",)
     empty_value_display = empty_value_display_constant
+
+
+@admin.register(Follow)
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ("pk", "user", "author", "fan_out_on_read")
+    list_filter = ("fan_out_on_read",)
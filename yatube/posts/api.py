@@ -0,0 +1,139 @@
+"""Read-only JSON API лент: главная, сообщество, профиль и пост.
+
+Строки выбираются через ``values()`` — без экземпляров моделей
+и шаблонов, — а JOIN-ы к автору и сообществу добавляются, только
+если их поля запрошены в ``?fields=``. Страницы идут по курсору
+(pub_date, id), как и в HTML-лентах: ``?cursor=`` из ``next_cursor``
+предыдущего ответа, ``?limit=`` — размер страницы.
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.http import JsonResponse
+
+from . import feed_cache
+from .models import Group, Post, User
+from .paginators import (CURSOR_ORDERING, NEXT, InvalidCursor, decode_cursor,
+                         encode_position)
+from .views import author_scope, feed_condition, group_scope
+
+FIELDS = {
+    "id": "id",
+    "text": "text",
+    "pub_date": "pub_date",
+    "author": "author__username",
+    "group": "group__slug",
+    "image": "image",
+    "comments_count": "comments_count",
+}
+
+MAX_LIMIT = 100
+
+JSON_PARAMS = {"ensure_ascii": False, "separators": (",", ":")}
+
+
+class ApiError(ValueError):
+    pass
+
+
+def api_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def parse_fields(request):
+    fields = request.GET.get("fields")
+    if not fields:
+        return list(FIELDS)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(FIELDS))
+    if unknown:
+        raise ApiError(f"Неизвестные поля: {', '.join(unknown)}")
+    return names
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get("limit", settings.ELEMENTS_PAGINATOR))
+    except ValueError:
+        raise ApiError("limit должен быть числом")
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def select(posts, fields):
+    lookups = {FIELDS[name] for name in fields} | {"id", "pub_date"}
+    return posts.values(*lookups)
+
+
+def serialize(row, fields):
+    item = {name: row[FIELDS[name]] for name in fields}
+    if item.get("image"):
+        item["image"] = default_storage.url(item["image"])
+    return item
+
+
+def feed_response(request, posts):
+    try:
+        fields = parse_fields(request)
+        limit = parse_limit(request)
+        cursor = request.GET.get("cursor")
+        if cursor:
+            _, pub_date, pk = decode_cursor(cursor)
+            posts = posts.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+    except InvalidCursor:
+        return api_response({"error": "Неверный курсор"}, status=400)
+    except ApiError as error:
+        return api_response({"error": str(error)}, status=400)
+    rows = list(select(posts.order_by(*CURSOR_ORDERING), fields)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_position(
+            NEXT, rows[-1]["pub_date"], rows[-1]["id"])
+    return api_response({
+        "results": [serialize(row, fields) for row in rows],
+        "next_cursor": next_cursor,
+    })
+
+
+def not_found():
+    return api_response({"error": "Не найдено"}, status=404)
+
+
+def post_scope(post_id):
+    author_id = Post.objects.filter(
+        pk=post_id).values_list("author_id", flat=True).first()
+    return author_id and feed_cache.profile_scope(author_id)
+
+
+@feed_condition(lambda: feed_cache.INDEX)
+def index(request):
+    return feed_response(request, Post.objects.feed())
+
+
+@feed_condition(group_scope)
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return not_found()
+    return feed_response(request, group.posts.feed())
+
+
+@feed_condition(author_scope)
+def profile(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return not_found()
+    return feed_response(request, author.posts.feed())
+
+
+@feed_condition(post_scope)
+def post_view(request, post_id):
+    try:
+        fields = parse_fields(request)
+    except ApiError as error:
+        return api_response({"error": str(error)}, status=400)
+    row = select(Post.objects.filter(pk=post_id), fields).first()
+    if row is None:
+        return not_found()
+    return api_response(serialize(row, fields))
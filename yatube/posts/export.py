@@ -0,0 +1,88 @@
+"""Потоковая выгрузка постов и комментариев в JSON Lines и CSV.
+
+Строки читаются пачками по первичному ключу (``id > последний``), так что
+память не растёт с размером таблицы, а выгрузку можно продолжить с любого
+места, передав id последней полученной строки.
+"""
+import csv
+import json
+
+from .models import Comment, Post
+
+EXPORTS = {
+    "posts": (Post, (
+        ("id", "id"),
+        ("author", "author__username"),
+        ("group", "group__slug"),
+        ("text", "text"),
+        ("pub_date", "pub_date"),
+        ("image", "image"),
+    )),
+    "comments": (Comment, (
+        ("id", "id"),
+        ("post", "post_id"),
+        ("author", "author__username"),
+        ("text", "text"),
+        ("created", "created"),
+    )),
+}
+
+FORMATS = ("jsonl", "csv")
+
+CONTENT_TYPES = {
+    "jsonl": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def iter_rows(kind, after_id=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    model, columns = EXPORTS[kind]
+    names = [name for name, _ in columns]
+    lookups = [lookup for _, lookup in columns]
+    queryset = model.objects.order_by("pk").values_list(*lookups)
+    last_id = after_id
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_id)[:chunk_size])
+        for row in chunk:
+            yield dict(zip(names, row))
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1][0]
+
+
+def serialize(value):
+    if value is None:
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer: возвращает строку вместо
+    записи в буфер.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_lines(kind, fmt="jsonl", after_id=0,
+               chunk_size=DEFAULT_CHUNK_SIZE):
+    """Строки выгрузки в формате ``fmt``, готовые к записи в поток."""
+    rows = iter_rows(kind, after_id, chunk_size)
+    if fmt == "jsonl":
+        for row in rows:
+            yield json.dumps(
+                {key: serialize(value) for key, value in row.items()},
+                ensure_ascii=False) + "\n"
+        return
+    _, columns = EXPORTS[kind]
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in columns])
+    for row in rows:
+        yield writer.writerow(
+            ["" if value is None else serialize(value)
+             for value in row.values()])
@@ -0,0 +1,115 @@
+"""Кеш отрендеренных страниц лент.
+
+Фрагменты кешируются тегом ``{% cache %}`` в шаблонах; среди ключей
+фрагмента есть версия ленты. Запись поста или комментария меняет версию
+затронутых лент — главной, сообщества и профиля автора, — и все их
+закешированные страницы разом перестают находиться в кеше.
+
+Версия и время последнего изменения ленты служат и валидаторами
+условных запросов: ETag и Last-Modified считаются по кешу без
+обращения к базе.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+INDEX = "index"
+
+
+def group_scope(group_id):
+    return f"group:{group_id}"
+
+
+def profile_scope(author_id):
+    return f"profile:{author_id}"
+
+
+def version_key(scope):
+    return f"feed-version:{scope}"
+
+
+def modified_key(scope):
+    return f"feed-modified:{scope}"
+
+
+def new_version():
+    # Версия от времени, а не с единицы: если ключ версии вытеснят
+    # из кеша, старые фрагменты не совпадут с новой версией.
+    return time.time_ns()
+
+
+def get_version(scope):
+    key = version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        version = new_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def feed_cache_context(scope):
+    return {
+        "feed_version": get_version(scope),
+        "feed_cache_timeout": settings.FEED_CACHE_TIMEOUT,
+    }
+
+
+def get_modified(scope):
+    """Время последнего изменения ленты (timestamp в целых секундах).
+    Если его нет в кеше, лента считается изменённой сейчас.
+    """
+    key = modified_key(scope)
+    modified = cache.get(key)
+    if modified is None:
+        modified = int(time.time())
+        if not cache.add(key, modified, None):
+            modified = cache.get(key, modified)
+    return modified
+
+
+def get_etag(request, scope):
+    """ETag страницы ленты: версия ленты, пользователь (от него зависят
+    шапка и кнопки) и адрес страницы с параметрами.
+    """
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"{get_version(scope)}-{request.user.pk or 0}-{path}"
+
+
+def bump(scopes):
+    for scope in scopes:
+        try:
+            cache.incr(version_key(scope))
+        except ValueError:
+            cache.set(version_key(scope), new_version(), None)
+    # Last-Modified передаётся с точностью до секунды. Чтобы две записи
+    # за одну секунду не дали один и тот же заголовок и клиент
+    # с If-Modified-Since не получил 304 после второй, время изменения
+    # растёт строго по целым секундам.
+    now = int(time.time())
+    keys = [modified_key(scope) for scope in scopes]
+    previous = cache.get_many(keys)
+    cache.set_many({
+        key: max(now, int(previous.get(key, 0)) + 1) for key in keys
+    }, None)
+
+
+def post_scopes(post):
+    scopes = {INDEX}
+    if post.group_id:
+        scopes.add(group_scope(post.group_id))
+    if post.author_id:
+        scopes.add(profile_scope(post.author_id))
+    return scopes
+
+
+def invalidate(scopes):
+    """Сбрасывает ленты сразу и ещё раз после коммита транзакции, чтобы
+    параллельный запрос не закешировал данные, которые видел до коммита.
+    """
+    scopes = set(scopes)
+    bump(scopes)
+    transaction.on_commit(lambda: bump(scopes))
@@ -20,6 +20,23 @@ class PostForm(forms.ModelForm):
         return data
 
 
+class ImageForm(forms.Form):
+    """Картинка к посту. Формат и размеры проверяет ImageUploadHandler
+    ещё при приёме файла; отклонённый файл приходит сюда ошибкой
+    ``upload_error``.
+    """
+    image = forms.FileField(label="картинка", required=False)
+
+    def __init__(self, *args, upload_error=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_error = upload_error
+
+    def clean_image(self):
+        if self.upload_error:
+            raise forms.ValidationError(self.upload_error)
+        return self.cleaned_data["image"]
+
+
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
@@ -0,0 +1,278 @@
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+from django.test import Client
+from mixer.backend.django import Mixer
+
+from posts.models import Comment, Group, Post
+
+from .benchmark_profiles import WSGIClient
+
+User = get_user_model()
+
+# Допустимый прирост среднего числа запросов: доля запросов из кеша
+# немного плавает от прогона к прогону, лишний запрос на каждый
+# ответ — уже регрессия.
+QUERY_SLACK = 0.5
+
+
+def seed(users, groups, posts, comments, random_seed):
+    """Наполняет базу через mixer: пользователи, сообщества, посты
+    и комментарии вставляются пачками, счётчики обновляет bulk_create
+    менеджеров постов и комментариев.
+    """
+    random.seed(random_seed)
+    mixer = Mixer(commit=False)
+    mixer.faker.seed_instance(random_seed)
+    User.objects.bulk_create(mixer.cycle(users).blend(
+        User, username=mixer.sequence("bench_{0}")))
+    Group.objects.bulk_create(mixer.cycle(groups).blend(
+        Group, slug=mixer.sequence("bench-{0}")))
+    authors = list(User.objects.order_by("pk"))
+    groups = [None, *Group.objects.order_by("pk")]
+    objs = mixer.cycle(posts).blend(
+        Post, author=mixer.RANDOM(*authors), group=None, image=None)
+    for post in objs:
+        post.group = random.choice(groups)
+    Post.objects.bulk_create(objs, batch_size=500)
+    Comment.objects.bulk_create(mixer.cycle(comments).blend(
+        Comment, author=mixer.RANDOM(*authors),
+        post=mixer.RANDOM(*Post.objects.order_by("pk"))), batch_size=500)
+
+
+def login_cookies(user):
+    """Cookie сессии и CSRF-токен, с которыми POST-запросы проходят
+    login_required и CsrfViewMiddleware.
+    """
+    client = Client()
+    client.force_login(user)
+    request = HttpRequest()
+    token = get_token(request)
+    cookies = {
+        settings.SESSION_COOKIE_NAME:
+            client.cookies[settings.SESSION_COOKIE_NAME].value,
+        settings.CSRF_COOKIE_NAME: request.META["CSRF_COOKIE"],
+    }
+    return cookies, token
+
+
+def percentile(values, percent):
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[
+        percent - 1]
+
+
+def find_regressions(baseline, result, tolerance):
+    """Сравнивает замер с базовым: p95 и rps могут ухудшиться не больше
+    чем на ``tolerance``, число запросов к базе — на QUERY_SLACK.
+    """
+    regressions = []
+    for name, current in result["endpoints"].items():
+        base = baseline["endpoints"].get(name)
+        if base is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {current['p95_ms']:.1f} мс, "
+                f"было {base['p95_ms']:.1f} мс")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {current['rps']:.1f} rps, "
+                f"было {base['rps']:.1f} rps")
+        if (current["queries_per_request"]
+                > base["queries_per_request"] + QUERY_SLACK):
+            regressions.append(
+                f"{name}: {current['queries_per_request']:.1f} запросов "
+                f"к базе, было {base['queries_per_request']:.1f}")
+    return regressions
+
+
+class Load:
+    """Запросы к одному адресу в несколько потоков: время ответа
+    и число запросов к базе замеряются для каждого запроса отдельно.
+    """
+
+    def __init__(self, client, concurrency):
+        self.client = client
+        self.concurrency = concurrency
+
+    def measure(self, send):
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connections["default"].execute_wrapper(count):
+            started = time.perf_counter()
+            status = send()
+            elapsed = time.perf_counter() - started
+        return status, elapsed, len(queries)
+
+    def run(self, name, requests, expected_status):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            samples = list(pool.map(self.measure, requests))
+        elapsed = time.perf_counter() - started
+        for status, _, _ in samples:
+            if status != expected_status:
+                raise CommandError(f"{name}: ответ {status}")
+        latencies = [sample[1] * 1000 for sample in samples]
+        return {
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "rps": len(samples) / elapsed,
+            "queries_per_request": statistics.mean(
+                sample[2] for sample in samples),
+        }
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный замер index, group, profile, post, post_new "
+            "и add_comment через WSGI-приложение на временной базе, "
+            "наполненной mixer. Печатает p50/p95/p99, rps и число "
+            "запросов к базе, сохраняет их в JSON и падает, если замер "
+            "хуже сохранённого.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--groups", type=int, default=5)
+        parser.add_argument("--posts", type=int, default=1000)
+        parser.add_argument("--comments", type=int, default=3000)
+        parser.add_argument("--requests", type=int, default=200,
+                            help="запросов на каждый адрес")
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--baseline",
+                            help="JSON с базовым замером для сравнения")
+        parser.add_argument("--save", action="store_true",
+                            help="записать замер в --baseline")
+        parser.add_argument("--tolerance", type=float, default=0.5,
+                            help="допустимое ухудшение p95 и rps")
+        parser.add_argument("--run", action="store_true",
+                            help="замерить на базе из YATUBE_DB_NAME "
+                                 "и вывести JSON")
+
+    def handle(self, *args, **options):
+        if options["run"]:
+            self.stdout.write(json.dumps(self.run(options)))
+            return
+        if options["save"] and not options["baseline"]:
+            raise CommandError("--save требует --baseline")
+        with tempfile.TemporaryDirectory() as directory:
+            result = self.run_isolated(directory, options)
+        self.report(result)
+        baseline = options["baseline"]
+        if options["save"]:
+            with open(baseline, "w", encoding="utf-8") as output:
+                json.dump(result, output, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Сохранено в {baseline}"))
+        elif baseline:
+            self.compare(baseline, result, options["tolerance"])
+
+    def run_isolated(self, directory, options):
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, "manage.py"),
+            "benchmark", "--run",
+            *(f"--{name}={options[name]}" for name in (
+                "users", "groups", "posts", "comments", "requests",
+                "concurrency", "seed")),
+        ]
+        env = {**os.environ,
+               "YATUBE_DB_NAME": os.path.join(directory, "db.sqlite3")}
+        completed = subprocess.run(command, env=env, capture_output=True,
+                                   text=True)
+        if completed.returncode:
+            raise CommandError(completed.stderr.strip())
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def run(self, options):
+        call_command("migrate", verbosity=0)
+        seed(options["users"], options["groups"], options["posts"],
+             options["comments"], options["seed"])
+        load = Load(WSGIClient(), options["concurrency"])
+        result = {
+            "volumes": {name: options[name] for name in (
+                "users", "groups", "posts", "comments")},
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "endpoints": {},
+        }
+        for name, requests, status in self.scenarios(options["requests"]):
+            result["endpoints"][name] = load.run(name, requests, status)
+        return result
+
+    def scenarios(self, count):
+        """Для каждого адреса — список запросов и ожидаемый статус.
+        Адреса чередуются по кругу, так что прогоны с одним --seed
+        повторяют друг друга.
+        """
+        client = WSGIClient()
+        posts = list(Post.objects.select_related("author").order_by("pk"))
+        groups = list(Group.objects.order_by("pk"))
+        users = list(User.objects.order_by("pk"))
+        logins = [login_cookies(user) for user in users]
+
+        def pick(items, index):
+            return items[index % len(items)]
+
+        def get(url):
+            return lambda: client.get(url)
+
+        def post(url, index, **data):
+            cookies, token = pick(logins, index)
+            return lambda: client.post(
+                url, {"csrfmiddlewaretoken": token, **data}, cookies)
+
+        yield "index", [get("/") for _ in range(count)], 200
+        yield "group", [get(f"/group/{pick(groups, index).slug}/")
+                        for index in range(count)], 200
+        yield "profile", [get(f"/{pick(users, index).username}/")
+                          for index in range(count)], 200
+        yield "post", [get(f"/{item.author.username}/{item.pk}/")
+                       for item in (pick(posts, index)
+                                    for index in range(count))], 200
+        yield "post_new", [
+            post("/new/", index, text=f"Пост {index}",
+                 group=pick(groups, index).pk)
+            for index in range(count)], 302
+        yield "add_comment", [
+            post(f"/{item.author.username}/{item.pk}/comment/", index,
+                 text=f"Комментарий {index}")
+            for index, item in ((index, pick(posts, index))
+                                for index in range(count))], 302
+
+    def report(self, result):
+        self.stdout.write(
+            f"{'адрес':<12} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} "
+            f"{'rps':>8} {'запросов':>9}")
+        for name, stats in result["endpoints"].items():
+            self.stdout.write(
+                f"{name:<12} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+                f"{stats['p99_ms']:>9.1f} {stats['rps']:>8.1f} "
+                f"{stats['queries_per_request']:>9.1f}")
+
+    def compare(self, path, result, tolerance):
+        with open(path, encoding="utf-8") as source:
+            baseline = json.load(source)
+        regressions = find_regressions(baseline, result, tolerance)
+        if regressions:
+            raise CommandError("Регрессия производительности:\n"
+                               + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("Регрессий нет"))
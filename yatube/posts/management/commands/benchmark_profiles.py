@@ -0,0 +1,141 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from io import BytesIO
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Group, Post
+
+PROFILES = ("dev", "production")
+
+
+def default_urls():
+    post = Post.objects.select_related("author").order_by("-pk").first()
+    if post is None:
+        raise CommandError("В базе нет постов: загрузите их через "
+                           "import_data перед замером.")
+    urls = ["/", f"/{post.author.username}/",
+            f"/{post.author.username}/{post.pk}/"]
+    group = Group.objects.order_by("pk").first()
+    if group is not None:
+        urls.append(f"/group/{group.slug}/")
+    return urls
+
+
+class WSGIClient:
+    """Запросы прямо в WSGI-приложение, как от сервера: с сигналами
+    начала и конца запроса, которые закрывают соединения с базой
+    по CONN_MAX_AGE.
+    """
+
+    def __init__(self):
+        self.handler = WSGIHandler()
+
+    def get(self, url, cookies=None):
+        return self.request("GET", url, cookies=cookies)
+
+    def post(self, url, data, cookies=None):
+        return self.request("POST", url, data=data, cookies=cookies)
+
+    def request(self, method, url, data=None, cookies=None):
+        path, _, query = url.partition("?")
+        body = urlencode(data or {}).encode()
+        environ = {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "CONTENT_TYPE": "application/x-www-form-urlencoded",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": BytesIO(body),
+        }
+        if cookies:
+            environ["HTTP_COOKIE"] = "; ".join(
+                f"{name}={value}" for name, value in cookies.items())
+        setup_testing_defaults(environ)
+        statuses = []
+        response = self.handler(
+            environ, lambda status, headers, exc_info=None:
+            statuses.append(status))
+        try:
+            b"".join(response)
+        finally:
+            response.close()
+        return int(statuses[0].split()[0])
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает число запросов в секунду в профилях настроек "
+            "dev и production на данных из текущей базы.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="*")
+        parser.add_argument("--requests", type=int, default=200,
+                            help="запросов на каждый адрес")
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument("--profiles", nargs="+", choices=PROFILES,
+                            default=list(PROFILES))
+        parser.add_argument("--run", action="store_true",
+                            help="замерить текущий профиль и вывести JSON")
+
+    def handle(self, *args, **options):
+        if options["run"]:
+            self.stdout.write(json.dumps(self.run(options)))
+            return
+        results = [self.run_profile(profile, options)
+                   for profile in options["profiles"]]
+        self.report(results)
+
+    def run(self, options):
+        urls = options["urls"] or default_urls()
+        client = WSGIClient()
+        result = {"debug": settings.DEBUG, "urls": {}}
+        for url in urls:
+            for _ in range(options["warmup"]):
+                status = client.get(url)
+                if status != 200:
+                    raise CommandError(f"{url}: ответ {status}")
+            started = time.perf_counter()
+            for _ in range(options["requests"]):
+                client.get(url)
+            elapsed = time.perf_counter() - started
+            result["urls"][url] = options["requests"] / elapsed
+        return result
+
+    def run_profile(self, profile, options):
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, "manage.py"),
+            "benchmark_profiles", "--run",
+            "--requests", str(options["requests"]),
+            "--warmup", str(options["warmup"]), *options["urls"],
+        ]
+        env = {**os.environ, "YATUBE_PROFILE": profile}
+        # Замер локальный: production без своего ключа берёт текущий.
+        env.setdefault("YATUBE_SECRET_KEY", settings.SECRET_KEY)
+        completed = subprocess.run(command, env=env, capture_output=True,
+                                   text=True)
+        if completed.returncode:
+            raise CommandError(f"{profile}: {completed.stderr.strip()}")
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        result["profile"] = profile
+        return result
+
+    def report(self, results):
+        urls = list(results[0]["urls"])
+        header = f"{'адрес':<40}" + "".join(
+            f"{result['profile'] + ', rps':>18}" for result in results)
+        self.stdout.write(header)
+        for url in urls:
+            self.stdout.write(f"{url:<40}" + "".join(
+                f"{result['urls'][url]:>18.1f}" for result in results))
+        if len(results) == 2:
+            base, tuned = results
+            ratio = sum(tuned["urls"].values()) / sum(base["urls"].values())
+            self.stdout.write(self.style.SUCCESS(
+                f"{tuned['profile']} / {base['profile']}: x{ratio:.2f}"))
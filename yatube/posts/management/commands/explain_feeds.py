@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Group, Post, User
+from posts.paginators import COMMENTS_ORDERING, CURSOR_ORDERING
+
+
+class Command(BaseCommand):
+    help = ("Печатает планы выполнения (EXPLAIN) запросов главной "
+            "страницы, сообщества, профиля и страницы поста.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--group", help="slug сообщества")
+        parser.add_argument("--author", help="username автора")
+        parser.add_argument("--post", type=int, help="id поста")
+
+    def handle(self, *args, **options):
+        group = self.get_object(Group, slug=options["group"])
+        author = self.get_object(User, username=options["author"])
+        post = self.get_object(Post, pk=options["post"])
+        per_page = settings.ELEMENTS_PAGINATOR
+        feed = Post.objects.feed().order_by(*CURSOR_ORDERING)
+
+        queries = (
+            ("index", feed[:per_page]),
+            ("group", feed.filter(group_id=group.pk)[:per_page]),
+            ("profile", feed.filter(author_id=author.pk)[:per_page]),
+            ("post", Post.objects.filter(author_id=post.author_id,
+                                         pk=post.pk)),
+            ("comments", Comment.objects.filter(post_id=post.pk)
+                .select_related("author").order_by(*COMMENTS_ORDERING)
+                [:settings.COMMENTS_PAGINATOR + 1]),
+        )
+        for name, queryset in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name}:"))
+            self.stdout.write(queryset.explain())
+            self.stdout.write("")
+
+    def get_object(self, model, **lookup):
+        """Объект для подстановки в запрос. Если он не задан, берётся
+        первый из базы или несохранённая заглушка — для плана запроса
+        важны не значения, а форма запроса.
+        """
+        if any(value is not None for value in lookup.values()):
+            return model.objects.get(**lookup)
+        return model.objects.order_by("pk").first() or model(pk=1)
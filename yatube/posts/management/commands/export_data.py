@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from posts.export import DEFAULT_CHUNK_SIZE, EXPORTS, FORMATS, iter_lines
+
+
+class Command(BaseCommand):
+    help = ("Потоково выгружает посты или комментарии в JSON Lines "
+            "или CSV. Выгрузку можно продолжить с id последней строки.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(EXPORTS))
+        parser.add_argument("--format", choices=FORMATS, default="jsonl")
+        parser.add_argument(
+            "--after-id", type=int, default=0,
+            help="выгружать строки с id больше заданного")
+        parser.add_argument(
+            "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            "-o", "--output", help="файл для выгрузки, по умолчанию stdout")
+
+    def handle(self, *args, **options):
+        lines = iter_lines(
+            options["kind"],
+            options["format"],
+            options["after_id"],
+            options["chunk_size"],
+        )
+        if not options["output"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+        with open(options["output"], "w", encoding="utf-8",
+                  newline="") as output:
+            output.writelines(lines)
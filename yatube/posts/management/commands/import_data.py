@@ -0,0 +1,180 @@
+import csv
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+FORMATS = ("jsonl", "csv")
+
+MODELS = {"groups": Group, "posts": Post, "comments": Comment}
+
+
+def read_rows(path, fmt):
+    with open(path, encoding="utf-8", newline="") as source:
+        if fmt == "csv":
+            yield from csv.DictReader(source)
+            return
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@contextmanager
+def keep_timestamp(model, field_name):
+    """Отключает auto_now_add, чтобы bulk_create сохранил даты
+    из файла, а не текущее время.
+    """
+    field = model._meta.get_field(field_name)
+    auto_now_add = field.auto_now_add
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = auto_now_add
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value, timezone.utc)
+    return value or timezone.now()
+
+
+def parse_id(value):
+    return int(value) if value not in (None, "") else None
+
+
+class Command(BaseCommand):
+    help = ("Загружает сообщества, посты или комментарии из JSON Lines "
+            "или CSV пачками через bulk_create. Формат строк совпадает "
+            "с выгрузкой export_data.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(MODELS))
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format", choices=FORMATS,
+            help="по умолчанию определяется по расширению файла")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--create-authors", action="store_true",
+            help="создавать пользователей для неизвестных username")
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or os.path.splitext(
+            options["path"])[1].lstrip(".").lower()
+        if fmt not in FORMATS:
+            raise CommandError(f"Неизвестный формат файла: {fmt}")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть больше нуля")
+        self.create_authors = options["create_authors"]
+        self.authors = dict(User.objects.values_list("username", "pk"))
+        self.groups = dict(Group.objects.values_list("slug", "pk"))
+        self.imported = self.skipped = 0
+
+        model = MODELS[options["kind"]]
+        build = getattr(self, f"build_{options['kind']}")
+        started = time.monotonic()
+        with keep_timestamp(Post, "pub_date"), \
+                keep_timestamp(Comment, "created"):
+            for batch in batched(read_rows(options["path"], fmt),
+                                 options["batch_size"]):
+                with transaction.atomic():
+                    objects = build(batch)
+                    model.objects.bulk_create(objects)
+                self.imported += len(objects)
+                self.skipped += len(batch) - len(objects)
+                self.report(started)
+        self.report(started, final=True)
+
+    def report(self, started, final=False):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        message = (f"Загружено {self.imported}, пропущено {self.skipped}, "
+                   f"{self.imported / elapsed:.0f} строк/с")
+        if final:
+            self.stdout.write(self.style.SUCCESS(message))
+        else:
+            self.stderr.write(message)
+
+    def author_ids(self, usernames):
+        missing = {name for name in usernames
+                   if name and name not in self.authors}
+        if missing and self.create_authors:
+            User.objects.bulk_create(
+                [User(username=name) for name in missing])
+            self.authors.update(User.objects.filter(
+                username__in=missing).values_list("username", "pk"))
+        return self.authors
+
+    def build_groups(self, rows):
+        groups = []
+        for row in rows:
+            if not row.get("slug") or row["slug"] in self.groups:
+                continue
+            # id станет известен после загрузки, пока отмечаем slug занятым.
+            self.groups[row["slug"]] = None
+            groups.append(Group(
+                title=row["title"], slug=row["slug"],
+                description=row.get("description") or ""))
+        return groups
+
+    def build_posts(self, rows):
+        authors = self.author_ids(row.get("author") for row in rows)
+        posts = []
+        for row in rows:
+            author_id = authors.get(row.get("author"))
+            if author_id is None:
+                continue
+            posts.append(Post(
+                id=parse_id(row.get("id")),
+                text=row["text"],
+                author_id=author_id,
+                group_id=self.groups.get(row.get("group")),
+                pub_date=parse_date(row.get("pub_date")),
+                image=row.get("image") or None,
+            ))
+        return posts
+
+    def build_comments(self, rows):
+        authors = self.author_ids(row.get("author") for row in rows)
+        post_ids = set(Post.objects.filter(
+            pk__in={parse_id(row.get("post")) for row in rows}
+        ).values_list("pk", flat=True))
+        comments = []
+        for row in rows:
+            author_id = authors.get(row.get("author"))
+            post_id = parse_id(row.get("post"))
+            if author_id is None or post_id not in post_ids:
+                continue
+            comments.append(Comment(
+                id=parse_id(row.get("id")),
+                text=row["text"],
+                author_id=author_id,
+                post_id=post_id,
+                created=parse_date(row.get("created")),
+            ))
+        return comments
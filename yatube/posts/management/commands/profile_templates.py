@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from posts.template_profiler import profile_templates
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Запрашивает страницы и печатает время рендеринга каждого "
+            "шаблона и include, от самых медленных.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="*", default=["/"])
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--user", help="username, от чьего имени "
+                                           "запрашивать страницы")
+        parser.add_argument(
+            "--clear-cache", action="store_true",
+            help="чистить кеш перед каждым запросом, чтобы ленты "
+                 "рендерились заново; очищает весь кеш, в том числе "
+                 "общий memcached")
+
+    def handle(self, *args, **options):
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        if options["user"]:
+            user = User.objects.filter(username=options["user"]).first()
+            if user is None:
+                raise CommandError(f"Нет пользователя {options['user']}")
+            client.force_login(user)
+        with profile_templates() as profile:
+            for _ in range(options["repeat"]):
+                for url in options["urls"]:
+                    if options["clear_cache"]:
+                        cache.clear()
+                    response = client.get(url)
+                    if response.status_code != 200:
+                        raise CommandError(
+                            f"{url}: ответ {response.status_code}")
+        self.stdout.write(profile.report())
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Counter, Follow, Group, Post
+
+
+def count_by(queryset, field):
+    """Подзапрос с числом строк ``queryset``, ссылающихся на
+    внешнюю строку через ``field``.
+    """
+    return Coalesce(Subquery(
+        queryset
+        .filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(count=Count("pk"))
+        .values("count")
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает денормализованные счётчики постов, "
+            "комментариев и подписок по данным таблиц.")
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        posts = Post.objects.update(
+            comments_count=count_by(Comment.objects, "post"))
+        groups = Group.objects.update(
+            posts_count=count_by(Post.objects, "group"))
+
+        Counter.objects.filter(
+            Q(name=Counter.TOTAL_POSTS)
+            | Q(name__startswith=Counter.author_posts(""))
+            | Q(name__startswith=Counter.author_followers(""))
+            | Q(name__startswith=Counter.user_follows(""))
+        ).delete()
+        by_author = (
+            Post.objects
+            .filter(author__isnull=False)
+            .order_by()
+            .values_list("author")
+            .annotate(count=Count("pk"))
+        )
+        counters = [Counter(name=Counter.TOTAL_POSTS,
+                            value=Post.objects.count())]
+        counters += [
+            Counter(name=Counter.author_posts(author_id), value=count)
+            for author_id, count in by_author
+        ]
+        authors = len(counters) - 1
+        for field, name in (("author", Counter.author_followers),
+                            ("user", Counter.user_follows)):
+            counters += [
+                Counter(name=name(user_id), value=count)
+                for user_id, count in Follow.objects.order_by().values_list(
+                    field).annotate(count=Count("pk"))
+            ]
+        Counter.objects.bulk_create(counters, batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Пересчитано: постов {posts}, сообществ {groups}, "
+            f"авторов {authors}, "
+            f"подписок {Follow.objects.count()}."))
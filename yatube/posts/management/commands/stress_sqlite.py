@@ -0,0 +1,147 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+MODES = ("before", "after")
+
+
+class Stress:
+    """Писатели публикуют посты, комментируют и переподписываются,
+    читатели листают главную; каждый поток со своим соединением.
+    """
+
+    def __init__(self, authors, seconds):
+        self.authors = authors
+        self.seconds = seconds
+        self.post = Post.objects.create(text="Первый пост", author=authors[0])
+        self.stats = {"writes": 0, "reads": 0, "locked": 0}
+        self.lock = threading.Lock()
+        self.deadline = None
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def loop(self, action, key):
+        try:
+            while time.monotonic() < self.deadline:
+                try:
+                    action()
+                    self.count(key)
+                except OperationalError:
+                    self.count("locked")
+        finally:
+            connections.close_all()
+
+    def write(self, author):
+        Post.objects.create(text="Пост под нагрузкой", author=author)
+        Comment.objects.create(
+            text="Комментарий", author=author, post=self.post)
+        Follow.objects.unfollow(author, self.authors[0])
+        Follow.objects.follow(author, self.authors[0])
+
+    def read(self):
+        list(Post.objects.feed()[:settings.ELEMENTS_PAGINATOR])
+
+    def run(self, readers):
+        threads = [
+            threading.Thread(target=self.loop,
+                             args=(lambda a=author: self.write(a), "writes"))
+            for author in self.authors
+        ]
+        threads += [threading.Thread(target=self.loop,
+                                     args=(self.read, "reads"))
+                    for _ in range(readers)]
+        self.deadline = time.monotonic() + self.seconds
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {
+            "writes_per_sec": self.stats["writes"] / self.seconds,
+            "reads_per_sec": self.stats["reads"] / self.seconds,
+            "locked": self.stats["locked"],
+        }
+
+
+class Command(BaseCommand):
+    help = ("Нагружает SQLite параллельными писателями и читателями "
+            "и сравнивает пропускную способность на стандартном бэкенде "
+            "Django (before) и на настроенном из DATABASES "
+            "и SQLITE_PRAGMAS (after). "
+            "Каждый режим работает на своей временной базе.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument("--run", choices=MODES,
+                            help="замерить один режим на базе из "
+                                 "YATUBE_DB_NAME и вывести JSON")
+
+    def handle(self, *args, **options):
+        if options["run"]:
+            self.stdout.write(json.dumps(self.run(options)))
+            return
+        with tempfile.TemporaryDirectory() as directory:
+            results = [self.run_mode(mode, directory, options)
+                       for mode in MODES]
+        self.report(results)
+
+    def run_mode(self, mode, directory, options):
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, "manage.py"),
+            "stress_sqlite", "--run", mode,
+            "--writers", str(options["writers"]),
+            "--readers", str(options["readers"]),
+            "--seconds", str(options["seconds"]),
+        ]
+        env = {**os.environ,
+               "YATUBE_DB_NAME": os.path.join(directory, f"{mode}.sqlite3")}
+        completed = subprocess.run(command, env=env, capture_output=True,
+                                   text=True)
+        if completed.returncode:
+            raise CommandError(f"{mode}: {completed.stderr.strip()}")
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        result["mode"] = mode
+        return result
+
+    def run(self, options):
+        if options["run"] == "before":
+            # Как у Django по умолчанию: журнал DELETE, таймаут 5 с,
+            # отложенный BEGIN.
+            settings.SQLITE_PRAGMAS = {}
+            connections.databases["default"].update(
+                ENGINE="django.db.backends.sqlite3", OPTIONS={})
+            connections.close_all()
+            connections["default"] = connections.create_connection("default")
+        call_command("migrate", verbosity=0)
+        authors = [User.objects.create_user(username=f"stress_{item}")
+                   for item in range(options["writers"])]
+        for reader in authors:
+            for author in authors:
+                Follow.objects.follow(reader, author)
+        connections.close_all()
+        return Stress(authors, options["seconds"]).run(options["readers"])
+
+    def report(self, results):
+        self.stdout.write(f"{'режим':<8} {'записей/с':>10} {'чтений/с':>10} "
+                          f"{'database is locked':>20}")
+        for result in results:
+            self.stdout.write(
+                f"{result['mode']:<8} {result['writes_per_sec']:>10.1f} "
+                f"{result['reads_per_sec']:>10.1f} {result['locked']:>20}")
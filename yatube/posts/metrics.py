@@ -0,0 +1,197 @@
+"""Время запросов по слоям: база, шаблоны, миниатюры и кеш.
+
+``MetricsMiddleware`` отдаёт разбивку в заголовке ``Server-Timing`` и
+копит гистограммы по имени URL (``index``, ``group``, ``profile``,
+``post``...) в памяти процесса. Их в текстовом формате Prometheus
+отдаёт view ``metrics``, доступный только staff.
+
+Время базы берётся из записи ``QueryBudgetMiddleware``, поэтому
+``MetricsMiddleware`` стоит после него. Шаблоны замеряет бэкенд
+``DjangoTemplates`` из этого модуля, кеш — обёртки методов бэкендов
+кеша, миниатюры — ``timed("thumbnail")`` в ``posts.thumbnails``.
+Слои пересекаются: время шаблона включает запросы, кеш и миниатюры,
+которые выполнились во время рендеринга.
+
+Гистограммы у каждого процесса свои: при нескольких воркерах Prometheus
+видит воркер, на который попал его запрос.
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+PARTS = ("db", "template", "thumbnail", "cache")
+
+# Границы корзин гистограмм, секунды.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+CACHE_METHODS = (
+    "add", "get", "set", "touch", "delete", "get_many", "get_or_set",
+    "has_key", "incr", "decr", "set_many", "delete_many",
+)
+
+_local = threading.local()
+
+
+@contextmanager
+def timed(part):
+    """Добавляет время блока к слою ``part`` текущего запроса. Вложенные
+    замеры того же слоя не считаются дважды.
+    """
+    timings = getattr(_local, "timings", None)
+    if timings is None or part in _local.active:
+        yield
+        return
+    _local.active.add(part)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[part] += time.perf_counter() - started
+        _local.active.discard(part)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def samples(self):
+        """Пары (le, число наблюдений не больше le), как у Prometheus."""
+        yield from zip((str(bound) for bound in self.buckets), self.counts)
+        yield "+Inf", self.count
+
+
+class Registry:
+    """Гистограммы длительности запросов по имени URL и слою."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def observe(self, view, timings):
+        with self.lock:
+            for part, value in timings.items():
+                key = (view, part)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram()
+                self.histograms[key].observe(value)
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def render(self):
+        lines = [
+            "# HELP yatube_request_seconds Время обработки запроса "
+            "по имени URL и слою.",
+            "# TYPE yatube_request_seconds histogram",
+        ]
+        with self.lock:
+            for (view, part), histogram in sorted(self.histograms.items()):
+                labels = f'view="{view}",part="{part}"'
+                lines.extend(
+                    f'yatube_request_seconds_bucket{{{labels},le="{le}"}} '
+                    f'{count}'
+                    for le, count in histogram.samples())
+                lines.append(
+                    f"yatube_request_seconds_sum{{{labels}}} "
+                    f"{histogram.sum:.6f}")
+                lines.append(
+                    f"yatube_request_seconds_count{{{labels}}} "
+                    f"{histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = dict.fromkeys(PARTS, 0.0)
+        _local.timings, _local.active = timings, set()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.timings = None
+        timings["total"] = time.perf_counter() - started
+        recorder = getattr(request, "query_recorder", None)
+        if recorder is not None:
+            timings["db"] = recorder.time_ms / 1000
+        match = getattr(request, "resolver_match", None)
+        # У адресов без имени (static() в DEBUG) url_name равен None.
+        view = (match.url_name or match.view_name) if match else "unmatched"
+        registry.observe(view, timings)
+        response["Server-Timing"] = ", ".join(
+            f"{part};dur={value * 1000:.1f}"
+            for part, value in timings.items())
+        return response
+
+
+def metrics(request):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    return HttpResponse(registry.render(),
+                        content_type="text/plain; version=0.0.4")
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with timed("template"):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Бэкенд шаблонов Django с замером времени рендеринга."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+def timed_cache_method(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with timed("cache"):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def instrument_caches():
+    """Оборачивает методы каждого создаваемого бэкенда кеша замером
+    времени слоя ``cache``.
+    """
+    create_connection = caches.create_connection
+
+    def create_timed_connection(alias):
+        backend = create_connection(alias)
+        for name in CACHE_METHODS:
+            setattr(backend, name,
+                    timed_cache_method(getattr(backend, name)))
+        return backend
+
+    caches.create_connection = create_timed_connection
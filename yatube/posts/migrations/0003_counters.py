@@ -0,0 +1,68 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:54
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_by(queryset, field):
+    return Coalesce(Subquery(
+        queryset
+        .filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(count=Count("pk"))
+        .values("count")
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Comment = apps.get_model("posts", "Comment")
+    Counter = apps.get_model("posts", "Counter")
+    Group = apps.get_model("posts", "Group")
+    Post = apps.get_model("posts", "Post")
+
+    Post.objects.update(comments_count=count_by(Comment.objects, "post"))
+    Group.objects.update(posts_count=count_by(Post.objects, "group"))
+    by_author = (
+        Post.objects
+        .filter(author__isnull=False)
+        .order_by()
+        .values_list("author")
+        .annotate(count=Count("pk"))
+    )
+    Counter.objects.bulk_create(
+        [Counter(name="posts", value=Post.objects.count())]
+        + [Counter(name=f"posts:author:{author_id}", value=count)
+           for author_id, count in by_author],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Name')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Value')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Posts count'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Comments count'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -1,18 +1,219 @@
+import collections
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Case, F, Max, Q, Value, When
+from django.utils import timezone
+
+from . import feed_cache, thumbnails
 
 User = get_user_model()
 
 
+class DeletingPosts(threading.local):
+    """pk постов, которые удаляются в этом потоке внутри
+    ``with deleting_posts()``. Комментарии, удаляемые каскадом вместе
+    с постом, не пересчитывают comments_count и не сбрасывают кеш лент
+    каждый по отдельности: ленты сбросит post_delete самого поста.
+    """
+    pks = None
+
+    @contextmanager
+    def __call__(self):
+        if self.pks is not None:
+            yield
+            return
+        self.pks = set()
+        try:
+            yield
+        finally:
+            self.pks = None
+
+    def add(self, post_id):
+        if self.pks is not None:
+            self.pks.add(post_id)
+
+    def __contains__(self, post_id):
+        return self.pks is not None and post_id in self.pks
+
+
+deleting_posts = DeletingPosts()
+
+
+class CounterQuerySet(models.QuerySet):
+    def value(self, name):
+        value = self.filter(name=name).values_list("value", flat=True).first()
+        return value or 0
+
+    def value_many(self, names):
+        """Значения нескольких счётчиков одним запросом."""
+        values = dict.fromkeys(names, 0)
+        values.update(self.filter(name__in=names).values_list("name", "value"))
+        return values
+
+    def incr(self, name, delta=1):
+        """Атомарно меняет счётчик через F(), создавая его при первом
+        обращении.
+        """
+        if not delta:
+            return
+        if self.filter(name=name).update(value=F("value") + delta):
+            return
+        try:
+            with transaction.atomic():
+                self.create(name=name, value=delta)
+        except IntegrityError:
+            # Счётчик успел создать параллельный запрос.
+            self.filter(name=name).update(value=F("value") + delta)
+
+    def incr_many(self, deltas, chunk_size=400):
+        """Меняет много счётчиков разом: существующие одним UPDATE
+        с CASE на пачку, недостающие создаются через ``incr``.
+        """
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        names = list(deltas)
+        for start in range(0, len(names), chunk_size):
+            chunk = names[start:start + chunk_size]
+            existing = set(self.filter(name__in=chunk).values_list(
+                "name", flat=True))
+            if existing:
+                self.filter(name__in=existing).update(value=F("value") + Case(
+                    *(When(name=name, then=Value(deltas[name]))
+                      for name in existing),
+                    default=Value(0),
+                    output_field=models.BigIntegerField(),
+                ))
+            for name in chunk:
+                if name not in existing:
+                    self.incr(name, deltas[name])
+
+
+class Counter(models.Model):
+    """Денормализованные счётчики, которым нет места в полях моделей:
+    общее число постов, число постов, подписчиков и подписок
+    каждого пользователя.
+    """
+
+    TOTAL_POSTS = "posts"
+
+    name = models.CharField("Name", max_length=100, unique=True)
+    value = models.BigIntegerField("Value", default=0)
+
+    objects = CounterQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+    @staticmethod
+    def author_posts(author_id):
+        return f"posts:author:{author_id}"
+
+    @staticmethod
+    def author_followers(author_id):
+        return f"followers:author:{author_id}"
+
+    @staticmethod
+    def user_follows(user_id):
+        return f"follows:user:{user_id}"
+
+
 class Group(models.Model):
     title = models.CharField("Title", max_length=200, blank=False, null=False)
     slug = models.SlugField("Slug", unique=True)
     description = models.TextField("Description")
+    posts_count = models.IntegerField(
+        "Posts count", default=0, editable=False)
 
     def __str__(self):
         return self.title
 
 
+class ThumbnailsQuerySet(models.QuerySet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._with_thumbnails = False
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._with_thumbnails = self._with_thumbnails
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is not None
+        super()._fetch_all()
+        if self._with_thumbnails and not fetched:
+            thumbnails.prefetch_thumbnail_urls(
+                self.thumbnail_posts(self._result_cache))
+
+    def thumbnail_posts(self, results):
+        raise NotImplementedError
+
+    def with_thumbnails(self):
+        """Как prefetch_related, но для миниатюр: при выборке постов
+        проставляет им ``thumb_url``.
+        """
+        clone = self._chain()
+        clone._with_thumbnails = True
+        return clone
+
+
+class PostQuerySet(ThumbnailsQuerySet):
+    def thumbnail_posts(self, results):
+        return (post for post in results if isinstance(post, Post))
+
+    def feed(self):
+        """Посты для ленты: автор и сообщество подтягиваются JOIN-ом,
+        число комментариев хранится в самом посте, адреса миниатюр
+        достаются разом для всей выборки.
+        """
+        return self.select_related("author", "group").with_thumbnails()
+
+    def delete(self):
+        with deleting_posts():
+            return super().delete()
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        features = connections[self.db].features
+        with transaction.atomic(using=self.db):
+            if (not features.can_return_rows_from_bulk_insert
+                    and getattr(features, "locks_on_begin", False)):
+                self.reserve_ids(objs)
+            objs = super().bulk_create(objs, *args, **kwargs)
+            update_post_counters(objs)
+            TimelineEntry.objects.fan_out(objs)
+        feed_cache.invalidate(
+            set().union(*(feed_cache.post_scopes(post) for post in objs)))
+        return objs
+
+    def reserve_ids(self, objs):
+        """SQLite не возвращает pk из bulk_create, а без pk fan_out не
+        разложит пост по лентам. Поэтому pk раздаются заранее, следом
+        за последним выданным: как и AUTOINCREMENT, учитываем
+        sqlite_sequence, чтобы не отдать id удалённого поста.
+
+        Вызывается только на бэкенде ``yatube.sqlite3``: его транзакция
+        открыта через BEGIN IMMEDIATE и уже держит блокировку записи,
+        так что чужая вставка эти pk не займёт.
+        """
+        missing = [obj for obj in objs if obj.pk is None]
+        if not missing:
+            return
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = %s",
+                [self.model._meta.db_table])
+            row = cursor.fetchone()
+        last = max([row[0] if row else 0,
+                    self.aggregate(last=Max("pk"))["last"] or 0,
+                    *(obj.pk for obj in objs if obj.pk is not None)])
+        for pk, obj in enumerate(missing, last + 1):
+            obj.pk = pk
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField("date published", auto_now_add=True)
@@ -28,12 +229,41 @@ class Post(models.Model):
         null=True,
         related_name="posts")
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    comments_count = models.IntegerField(
+        "Comments count", default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
+    def delete(self, *args, **kwargs):
+        with deleting_posts():
+            return super().delete(*args, **kwargs)
+
     class Meta:
         ordering = ("-pub_date",)
+        indexes = (
+            models.Index(fields=("pub_date", "id"),
+                         name="post_pub_date_idx"),
+            models.Index(fields=("author", "pub_date"),
+                         name="post_author_pub_date_idx"),
+            models.Index(fields=("group", "pub_date"),
+                         name="post_group_pub_date_idx"),
+        )
+
+
+class CommentQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        update_comment_counters(objs)
+        posts = Post.objects.filter(
+            pk__in={comment.post_id for comment in objs}).only(
+            "author_id", "group_id")
+        feed_cache.invalidate(set().union(
+            {feed_cache.INDEX},
+            *(feed_cache.post_scopes(post) for post in posts)))
+        return objs
 
 
 class Comment(models.Model):
@@ -49,3 +279,221 @@ class Comment(models.Model):
         related_name="comments")
     text = models.TextField()
     created = models.DateTimeField("date published", auto_now_add=True)
+
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(fields=("post", "created"),
+                         name="comment_post_created_idx"),
+        )
+
+
+class FollowQuerySet(models.QuerySet):
+    @transaction.atomic
+    def follow(self, user, author):
+        """Подписывает ``user`` на ``author`` и сразу кладёт в его ленту
+        последние посты автора.
+
+        Когда подписчиков у автора становится ``FOLLOW_FAN_OUT_LIMIT``,
+        все его подписки переводятся на fan-out on read: новые посты
+        больше не раскладываются по лентам при записи, а подтягиваются
+        каждым подписчиком при чтении ленты. Обратно автор не
+        переводится.
+        """
+        if user == author:
+            return None
+        on_read = self.filter(author=author, fan_out_on_read=True).exists()
+        follow, created = self.get_or_create(
+            user=user, author=author,
+            defaults={"fan_out_on_read": on_read,
+                      "last_pulled": timezone.now() if on_read else None})
+        if not created:
+            return follow
+        TimelineEntry.objects.add([user.pk], Post.objects.filter(
+            author=author).order_by("-pub_date")[:settings.TIMELINE_BACKFILL])
+        limit = settings.FOLLOW_FAN_OUT_LIMIT
+        if not on_read and self.filter(author=author)[:limit].count() >= limit:
+            self.filter(author=author).update(
+                fan_out_on_read=True, last_pulled=timezone.now())
+        return follow
+
+    @transaction.atomic
+    def unfollow(self, user, author):
+        self.filter(user=user, author=author).delete()
+        TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+class Follow(models.Model):
+    """Подписка ``user`` на посты ``author``."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="follower")
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="following")
+    fan_out_on_read = models.BooleanField("Fan-out on read", default=False)
+    last_pulled = models.DateTimeField("Last pulled", blank=True, null=True)
+
+    objects = FollowQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.author_id}"
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=("user", "author"),
+                                    name="unique_follow"),
+        )
+        indexes = (
+            models.Index(fields=("author", "fan_out_on_read"),
+                         name="follow_author_fan_out_idx"),
+        )
+
+
+class TimelineQuerySet(ThumbnailsQuerySet):
+    def thumbnail_posts(self, results):
+        return (entry.post for entry in results
+                if isinstance(entry, TimelineEntry))
+
+    def feed(self):
+        return self.select_related(
+            "post__author", "post__group").with_thumbnails()
+
+    def add(self, user_ids, posts):
+        self.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=post.pk,
+                           pub_date=post.pub_date)
+             for post in posts for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+
+    def fan_out(self, posts):
+        """Fan-out on write: раскладывает посты по лентам подписчиков
+        автора, кроме подписок, переведённых на fan-out on read.
+        """
+        by_author = collections.defaultdict(list)
+        for post in posts:
+            if post.pk and post.author_id:
+                by_author[post.author_id].append(post)
+        for author_id, author_posts in by_author.items():
+            self.add(Follow.objects.filter(
+                author_id=author_id, fan_out_on_read=False,
+            ).values_list("user_id", flat=True), author_posts)
+
+    def pull(self, user):
+        """Fan-out on read: докладывает в ленту ``user`` новые посты
+        авторов с большим числом подписчиков одним запросом на всех.
+        """
+        follows = list(Follow.objects.filter(user=user, fan_out_on_read=True))
+        if not follows:
+            return
+        new_posts = Q()
+        for follow in follows:
+            if follow.last_pulled is None:
+                new_posts |= Q(author_id=follow.author_id)
+            else:
+                new_posts |= Q(author_id=follow.author_id,
+                               pub_date__gt=follow.last_pulled)
+        posts = (
+            Post.objects
+            .filter(new_posts)
+            .only("pk", "pub_date", "author_id")
+            .order_by("-pub_date")
+        )
+        posts = list(posts[:settings.TIMELINE_BACKFILL])
+        if not posts:
+            return
+        self.add([user.pk], posts)
+        pulled = {}
+        for post in posts:
+            pulled[post.author_id] = max(
+                pulled.get(post.author_id, post.pub_date), post.pub_date)
+        Follow.objects.filter(user=user, author_id__in=pulled).update(
+            last_pulled=Case(
+                *(When(author_id=author_id, then=Value(pub_date))
+                  for author_id, pub_date in pulled.items()),
+                default=F("last_pulled"),
+                output_field=models.DateTimeField(),
+            ))
+
+
+class TimelineEntry(models.Model):
+    """Запись персональной ленты подписок: пост ``post`` в ленте
+    ``user``. Дата поста скопирована, чтобы страница ленты читалась
+    одним проходом по индексу (user, pub_date, id).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline")
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries")
+    pub_date = models.DateTimeField("date published")
+
+    objects = TimelineQuerySet.as_manager()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=("user", "post"),
+                                    name="unique_timeline_entry"),
+        )
+        indexes = (
+            models.Index(fields=("user", "pub_date", "id"),
+                         name="timeline_user_pub_date_idx"),
+        )
+
+
+def update_post_counters(posts, sign=1):
+    """Учитывает в счётчиках добавленные (sign=1) или удалённые
+    (sign=-1) посты.
+    """
+    if not posts:
+        return
+    by_author = collections.Counter(
+        post.author_id for post in posts if post.author_id)
+    deltas = {Counter.TOTAL_POSTS: sign * len(posts)}
+    for author_id, count in by_author.items():
+        deltas[Counter.author_posts(author_id)] = sign * count
+    Counter.objects.incr_many(deltas)
+    by_group = collections.Counter(
+        post.group_id for post in posts if post.group_id)
+    for group_id, count in by_group.items():
+        Group.objects.filter(pk=group_id).update(
+            posts_count=F("posts_count") + sign * count)
+
+
+def update_follow_counters(follows, sign=1):
+    deltas = collections.Counter()
+    for follow in follows:
+        deltas[Counter.author_followers(follow.author_id)] += sign
+        deltas[Counter.user_follows(follow.user_id)] += sign
+    Counter.objects.incr_many(deltas)
+
+
+def update_comment_counters(comments, sign=1, chunk_size=400):
+    """Меняет comments_count постов одним UPDATE с CASE на пачку
+    постов, как ``Counter.objects.incr_many``. Посты с одинаковым
+    приростом попадают в одну ветку CASE: при загрузке их большинство.
+    """
+    by_post = collections.Counter(
+        comment.post_id for comment in comments if comment.post_id)
+    post_ids = list(by_post)
+    for start in range(0, len(post_ids), chunk_size):
+        chunk = post_ids[start:start + chunk_size]
+        by_delta = collections.defaultdict(list)
+        for post_id in chunk:
+            by_delta[sign * by_post[post_id]].append(post_id)
+        Post.objects.filter(pk__in=chunk).update(
+            comments_count=F("comments_count") + Case(
+                *(When(pk__in=ids, then=Value(delta))
+                  for delta, ids in by_delta.items()),
+                default=Value(0),
+                output_field=models.IntegerField(),
+            ))
@@ -0,0 +1,228 @@
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+CURSOR_ORDERING = ("-pub_date", "-pk")
+COMMENTS_ORDERING = ("created", "pk")
+
+NEXT = "n"
+PREVIOUS = "p"
+
+# Больше id не помещается в INTEGER SQLite: запрос с ним падает
+# с OverflowError.
+MAX_PK = 2 ** 63 - 1
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_position(direction, date, pk):
+    """Курсор — позиция в ленте (дата, id) и направление перехода,
+    упакованные в безопасную для URL строку.
+    """
+    raw = f"{direction}|{date.isoformat()}|{pk}"
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def encode_cursor(obj, direction=NEXT, field="pub_date"):
+    return encode_position(direction, getattr(obj, field), obj.pk)
+
+
+def decode_cursor(cursor):
+    try:
+        direction, pub_date, pk = force_str(
+            urlsafe_base64_decode(cursor)).split("|")
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+    if (direction not in (NEXT, PREVIOUS) or pub_date is None
+            or not 1 <= pk <= MAX_PK):
+        raise InvalidCursor(cursor)
+    return direction, pub_date, pk
+
+
+class CursorPage(Page):
+    """Страница ленты, полученная по курсору.
+
+    Номера страницы у неё нет, переходы вперёд и назад делаются
+    по ``next_cursor`` и ``previous_cursor``.
+    """
+
+    def __init__(self, object_list, paginator, cursor=None,
+                 has_next=False, has_previous=False):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = None
+        self.previous_cursor = None
+        field = paginator.cursor_field
+        if has_next and object_list:
+            self.next_cursor = encode_cursor(object_list[-1], NEXT, field)
+        if has_previous and object_list:
+            self.previous_cursor = encode_cursor(
+                object_list[0], PREVIOUS, field)
+
+    def __repr__(self):
+        return f"<Page at cursor {self.cursor}>"
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+
+class FeedPage(Page):
+    """Страница по номеру. Ссылки «вперёд» и «назад» у неё тоже ведут
+    на курсоры; считаются они лениво, чтобы страница из кеша шаблона
+    не выполняла запрос к постам.
+    """
+
+    cursor = None
+
+    @cached_property
+    def next_cursor(self):
+        if self.has_next() and len(self):
+            return encode_cursor(self[len(self) - 1], NEXT)
+        return None
+
+    @cached_property
+    def previous_cursor(self):
+        if self.has_previous() and len(self):
+            return encode_cursor(self[0], PREVIOUS)
+        return None
+
+
+class FeedPaginator(Paginator):
+    def _get_page(self, *args, **kwargs):
+        return FeedPage(*args, **kwargs)
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id).
+
+    Не выполняет COUNT(*) и не использует OFFSET: каждая страница —
+    это выборка по индексу от позиции, записанной в курсоре.
+    """
+
+    cursor_field = "pub_date"
+
+    @property
+    def page_range(self):
+        # Общее число страниц неизвестно, номера страниц не выводим.
+        return range(0)
+
+    def get_cursor_page(self, cursor=None):
+        queryset = self.object_list.order_by(*CURSOR_ORDERING)
+        if not cursor:
+            return self._forward_page(queryset, None)
+        try:
+            direction, pub_date, pk = decode_cursor(cursor)
+        except InvalidCursor:
+            return self._forward_page(queryset, None)
+        if direction == NEXT:
+            older = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+            return self._forward_page(older, cursor)
+        newer = queryset.filter(
+            Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk))
+        items = list(newer.order_by("pub_date", "pk")[:self.per_page + 1])
+        if len(items) <= self.per_page:
+            # Дошли до начала ленты: отдаём обычную первую страницу,
+            # чтобы она не оказалась короче остальных.
+            return self._forward_page(queryset, None)
+        items = items[:self.per_page]
+        items.reverse()
+        return CursorPage(items, self, cursor, has_next=True,
+                          has_previous=True)
+
+    def _forward_page(self, queryset, cursor):
+        items = list(queryset[:self.per_page + 1])
+        return CursorPage(
+            items[:self.per_page],
+            self,
+            cursor,
+            has_next=len(items) > self.per_page,
+            has_previous=cursor is not None,
+        )
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии от старых к новым по ключу (created, id).
+
+    Страницы идут только вперёд: следующая порция подгружается
+    по ``next_cursor`` кнопкой «Показать ещё».
+    """
+
+    cursor_field = "created"
+
+    def get_cursor_page(self, cursor=None):
+        queryset = self.object_list.order_by(*COMMENTS_ORDERING)
+        if cursor:
+            try:
+                _, created, pk = decode_cursor(cursor)
+            except InvalidCursor:
+                cursor = None
+            else:
+                queryset = queryset.filter(
+                    Q(created__gt=created) | Q(created=created, pk__gt=pk))
+        return self._forward_page(queryset, cursor)
+
+
+class CachedCountPaginator(FeedPaginator):
+    """Пагинатор, который берёт общее число объектов из денормализованного
+    счётчика вместо COUNT(*) по таблице.
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cached_count = count
+
+    @cached_property
+    def count(self):
+        return max(self.cached_count, 0)
+
+
+def page_window(number, num_pages, on_each_side=2, on_ends=1):
+    """Номера страниц для навигации: ``on_ends`` первых и последних
+    и ``on_each_side`` по обе стороны от текущей, пропуски — None.
+    Длина списка не зависит от числа страниц.
+    """
+    if num_pages <= 2 * (on_each_side + on_ends) + 1:
+        return list(range(1, num_pages + 1))
+    window = set(range(1, on_ends + 1))
+    window.update(range(num_pages - on_ends + 1, num_pages + 1))
+    window.update(range(max(number - on_each_side, 1),
+                        min(number + on_each_side, num_pages) + 1))
+    pages = []
+    for page in sorted(window):
+        if pages and page != pages[-1] + 1:
+            pages.append(None)
+        pages.append(page)
+    return pages
+
+
+def get_page(request, post_list, per_page, count=None):
+    """Возвращает страницу ленты для запроса.
+
+    С параметром ``cursor`` страница строится по ключу без COUNT и OFFSET,
+    иначе — по номеру из ``page``. Ссылки «вперёд» и «назад» у обычной
+    страницы тоже ведут на курсоры, так что OFFSET остаётся только
+    у явного перехода на страницу по номеру. Если передан ``count``,
+    COUNT(*) не выполняется и для нумерованных страниц.
+    """
+    if "cursor" in request.GET:
+        paginator = CursorPaginator(post_list, per_page)
+        return paginator.get_cursor_page(request.GET.get("cursor"))
+    post_list = post_list.order_by(*CURSOR_ORDERING)
+    if count is None:
+        paginator = FeedPaginator(post_list, per_page)
+    else:
+        paginator = CachedCountPaginator(post_list, per_page, count)
+    return paginator.get_page(request.GET.get("page"))
@@ -0,0 +1,143 @@
+"""Бюджеты запросов к базе для view.
+
+``QueryBudgetMiddleware`` записывает SQL каждого запроса: число,
+суммарное время и повторы одного и того же SQL с разными параметрами —
+так выглядит N+1 из цикла в шаблоне. Запись лежит в
+``request.query_recorder``.
+
+View объявляет бюджет декоратором ``query_budget``. Если запрос его
+превысил, middleware пишет предупреждение в лог, а при
+``QUERY_BUDGET_RAISE`` бросает ``QueryBudgetExceeded`` — так N+1
+роняет тесты, а не доезжает до продакшена. Превышение времени в базе
+только пишется в лог: оно зависит от машины, и тесты от него не должны
+падать. В тестах бюджет запросов проверяет
+``QueryBudgetTestMixin.assertQueryBudget``.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+    """Обёртка выполнения запросов (``connection.execute_wrapper``),
+    которая запоминает SQL и время каждого запроса.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def time_ms(self):
+        return sum(duration for _, duration in self.queries) * 1000
+
+    def duplicates(self):
+        """SQL, выполненные больше одного раза, и число их повторов."""
+        counts = Counter(sql for sql, _ in self.queries)
+        return {sql: count for sql, count in counts.items() if count > 1}
+
+
+@contextmanager
+def record_queries(using=connection):
+    recorder = QueryRecorder()
+    with using.execute_wrapper(recorder):
+        yield recorder
+
+
+class QueryBudget:
+    def __init__(self, queries=None, time_ms=None, duplicates=0):
+        self.queries = queries
+        self.time_ms = time_ms
+        self.duplicates = duplicates
+
+    def violations(self, recorder):
+        """Превышения числа запросов и повторов."""
+        violations = []
+        if self.queries is not None and recorder.count > self.queries:
+            violations.append(
+                f"{recorder.count} запросов при бюджете {self.queries}")
+        if self.duplicates is not None:
+            violations.extend(
+                f"{count} раз: {sql}"
+                for sql, count in recorder.duplicates().items()
+                if count - 1 > self.duplicates)
+        return violations
+
+    def slowdown(self, recorder):
+        if self.time_ms is not None and recorder.time_ms > self.time_ms:
+            return (f"{recorder.time_ms:.1f} мс в базе "
+                    f"при бюджете {self.time_ms} мс")
+        return None
+
+
+def query_budget(queries=None, time_ms=None, duplicates=0):
+    """Бюджет view: не больше ``queries`` запросов и ``time_ms``
+    миллисекунд в базе, каждый SQL повторяется не больше
+    ``duplicates`` раз. None снимает ограничение.
+    """
+    def decorator(view):
+        view.query_budget = QueryBudget(queries, time_ms, duplicates)
+        return view
+    return decorator
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_queries() as recorder:
+            request.query_recorder = recorder
+            response = self.get_response(request)
+        match = getattr(request, "resolver_match", None)
+        budget = getattr(match and match.func, "query_budget", None)
+        if budget is not None:
+            self.check(budget, recorder, match)
+        return response
+
+    def check(self, budget, recorder, match):
+        slowdown = budget.slowdown(recorder)
+        if slowdown:
+            logger.warning("View %s превысил бюджет времени: %s",
+                           match.view_name, slowdown)
+        violations = budget.violations(recorder)
+        if not violations:
+            return
+        message = (f"View {match.view_name} превысил бюджет запросов: "
+                   + "; ".join(violations))
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class QueryBudgetTestMixin:
+    """Проверки бюджета запросов для TestCase."""
+
+    @contextmanager
+    def assertQueryBudget(self, queries=None, duplicates=0):
+        with record_queries() as recorder:
+            yield recorder
+        violations = QueryBudget(
+            queries, duplicates=duplicates).violations(recorder)
+        if violations:
+            self.fail("Бюджет запросов превышен: " + "; ".join(violations))
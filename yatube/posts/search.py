@@ -0,0 +1,87 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite поиск идёт по индексу FTS5 ``posts_post_fts`` (миграция 0004),
+который триггеры держат в согласии с таблицей постов. Результаты
+ранжируются по bm25, время поиска зависит от числа совпадений, а не от
+размера таблицы. Без FTS5 поиск откатывается к ``icontains``.
+"""
+import re
+
+from django.db import connection
+
+from .models import Post
+
+FTS_TABLE = "posts_post_fts"
+
+_fts_available = {}
+
+
+def fts_available():
+    alias = connection.settings_dict["NAME"]
+    if alias not in _fts_available:
+        _fts_available[alias] = (
+            connection.vendor == "sqlite"
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available[alias]
+
+
+def tokenize(query):
+    return re.findall(r"\w+", query.lower())
+
+
+def build_match(query):
+    """Запрос FTS5: все слова должны встретиться, каждое — как префикс.
+    Слова берутся в кавычки, поэтому операторы FTS5 из ввода не работают.
+    """
+    return " ".join(f'"{token}"*' for token in tokenize(query))
+
+
+class SearchResults:
+    """Ленивая выборка найденных постов для Paginator: count() и срезы
+    выполняются запросами к индексу, посты подтягиваются только для
+    запрошенной страницы.
+    """
+
+    def __init__(self, query):
+        self.match = build_match(query)
+
+    def count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s",
+                [self.match])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.match:
+            return []
+        start = index.start or 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY rank LIMIT %s OFFSET %s",
+                [self.match, index.stop - start, start])
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_posts(query):
+    if fts_available():
+        return SearchResults(query)
+    tokens = tokenize(query)
+    if not tokens:
+        return Post.objects.none()
+    posts = Post.objects.feed().order_by("-pub_date", "-pk")
+    for token in tokens:
+        posts = posts.filter(text__icontains=token)
+    return posts
@@ -0,0 +1,102 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import feed_cache, thumbnails
+from .models import (Comment, Follow, Post, TimelineEntry, deleting_posts,
+                     update_comment_counters, update_follow_counters,
+                     update_post_counters)
+
+
+@receiver(pre_save, sender=Post)
+def remember_counted_fields(sender, instance, raw, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._counted = Post.objects.filter(pk=instance.pk).values(
+        "author_id", "group_id", "image", "comments_count").first()
+    if instance._counted is not None:
+        # Не затираем комментарии, добавленные после загрузки поста.
+        instance.comments_count = instance._counted.pop("comments_count")
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    scopes = feed_cache.post_scopes(instance)
+    counted = getattr(instance, "_counted", None)
+    instance._counted = None
+    if instance.image and (
+            created or counted and counted["image"] != instance.image.name):
+        thumbnails.pregenerate_on_commit(
+            instance.image.name, feed_cache.post_scopes(instance))
+    if created:
+        update_post_counters([instance])
+        TimelineEntry.objects.fan_out([instance])
+    elif counted is not None:
+        old = Post(**counted)
+        scopes |= feed_cache.post_scopes(old)
+        if (old.author_id, old.group_id) != (
+                instance.author_id, instance.group_id):
+            update_post_counters([old], -1)
+            update_post_counters([instance])
+        if old.author_id != instance.author_id:
+            instance.timeline_entries.all().delete()
+            TimelineEntry.objects.fan_out([instance])
+    feed_cache.invalidate(scopes)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_deleted_post(sender, instance, **kwargs):
+    deleting_posts.add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    update_post_counters([instance], -1)
+    feed_cache.invalidate(feed_cache.post_scopes(instance))
+
+
+def invalidate_comment_feeds(comment):
+    post = Post.objects.filter(pk=comment.post_id).values(
+        "author_id", "group_id").first()
+    scopes = {feed_cache.INDEX}
+    if post is not None:
+        scopes = feed_cache.post_scopes(Post(**post))
+    feed_cache.invalidate(scopes)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        update_comment_counters([instance])
+    invalidate_comment_feeds(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts:
+        return
+    update_comment_counters([instance], -1)
+    invalidate_comment_feeds(instance)
+
+
+def invalidate_follow_profiles(follow):
+    # Счётчики подписок и кнопка «Подписаться» — часть страниц профиля.
+    feed_cache.invalidate({feed_cache.profile_scope(follow.author_id),
+                           feed_cache.profile_scope(follow.user_id)})
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        update_follow_counters([instance])
+        invalidate_follow_profiles(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    update_follow_counters([instance], -1)
+    invalidate_follow_profiles(instance)
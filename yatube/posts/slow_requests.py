@@ -0,0 +1,125 @@
+"""Профилировщик медленных запросов.
+
+Пока идёт запрос, фоновый поток раз в ``SLOW_REQUEST_SAMPLE_INTERVAL``
+секунд снимает стек потока, который его обрабатывает
+(``sys._current_frames``). Если запрос уложился в
+``SLOW_REQUEST_THRESHOLD``, стеки выбрасываются; если нет — пишутся в
+каталог ``SLOW_REQUEST_PROFILE_DIR`` в свёрнутом формате
+(``кадр;кадр;кадр число``), который понимают flamegraph.pl и speedscope.
+
+Включается заданием каталога. Стоимость — один проход по стеку
+каждого идущего запроса за интервал, а без запросов поток спит, не
+просыпаясь, поэтому профилировщик можно держать включённым
+в продакшене и ловить редкие выбросы.
+"""
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+
+def collapse(frame):
+    """Стек от внешнего вызова к текущему: ``модуль:функция`` через «;»."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', code.co_filename)}"
+                     f":{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler:
+    """Общий на процесс поток, который снимает стеки потоков
+    из ``watch``.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = {}
+        self.lock = threading.Lock()
+        self.watched = threading.Condition(self.lock)
+        self.thread = None
+
+    def watch(self, thread_id):
+        with self.watched:
+            self.stacks[thread_id] = collections.Counter()
+            self.watched.notify()
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="slow-request-sampler",
+                    daemon=True)
+                self.thread.start()
+
+    def unwatch(self, thread_id):
+        with self.lock:
+            return self.stacks.pop(thread_id, None)
+
+    def run(self):
+        while True:
+            with self.watched:
+                self.watched.wait_for(lambda: self.stacks)
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, stacks in self.stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse(frame)] += 1
+            del frames
+
+
+_samplers = {}
+_samplers_lock = threading.Lock()
+
+
+def get_sampler(interval):
+    with _samplers_lock:
+        if interval not in _samplers:
+            _samplers[interval] = Sampler(interval)
+        return _samplers[interval]
+
+
+def write_stacks(directory, name, elapsed, stacks):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(
+        directory,
+        f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-"
+        f"{elapsed * 1000:.0f}ms-{threading.get_ident()}.collapsed")
+    with open(path, "w", encoding="utf-8") as output:
+        for stack, count in stacks.most_common():
+            output.write(f"{stack} {count}\n")
+    return path
+
+
+class SlowRequestProfilerMiddleware:
+    def __init__(self, get_response):
+        if not settings.SLOW_REQUEST_PROFILE_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sampler = get_sampler(settings.SLOW_REQUEST_SAMPLE_INTERVAL)
+
+    def __call__(self, request):
+        thread_id = threading.get_ident()
+        self.sampler.watch(thread_id)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = self.sampler.unwatch(thread_id)
+        elapsed = time.perf_counter() - started
+        if elapsed >= settings.SLOW_REQUEST_THRESHOLD and stacks:
+            match = getattr(request, "resolver_match", None)
+            path = write_stacks(
+                settings.SLOW_REQUEST_PROFILE_DIR,
+                match.view_name if match else "unmatched", elapsed, stacks)
+            logger.warning("Медленный запрос %s: %.0f мс, стеки в %s",
+                           request.path, elapsed * 1000, path)
+        return response
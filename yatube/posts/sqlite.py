@@ -0,0 +1,18 @@
+"""Настройка соединений с SQLite.
+
+PRAGMA из ``settings.SQLITE_PRAGMAS`` выполняются на каждом новом
+соединении: при постоянных соединениях (CONN_MAX_AGE) — один раз
+на соединение, а не на запрос. Они идут прямо в соединение sqlite3,
+мимо обёрток курсора Django, и не попадают в счёт запросов view.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
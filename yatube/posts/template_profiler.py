@@ -0,0 +1,85 @@
+"""Профилировщик рендеринга шаблонов.
+
+Внутри ``profile_templates()`` замеряется каждый вызов
+``Template._render``: страница, родитель из ``{% extends %}`` и каждый
+``{% include %}``. Для шаблона копятся число рендеров, полное время
+и собственное время — без вложенных шаблонов, — по которому и видно,
+какой фрагмент медленный. Блоки дочернего шаблона рендерятся внутри
+родителя из ``{% extends %}`` и попадают в его собственное время.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.template.base import Template
+
+_state = threading.local()
+
+
+class TemplateStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.own = 0.0
+
+
+class TemplateProfile:
+    def __init__(self):
+        self.templates = {}
+
+    def record(self, name, total, own):
+        stats = self.templates.setdefault(name, TemplateStats())
+        stats.count += 1
+        stats.total += total
+        stats.own += own
+
+    def rows(self):
+        return sorted(self.templates.items(),
+                      key=lambda item: item[1].own, reverse=True)
+
+    def report(self):
+        lines = [f"{'шаблон':<40} {'рендеров':>9} {'всего, мс':>10} "
+                 f"{'своё, мс':>10}"]
+        for name, stats in self.rows():
+            lines.append(f"{name:<40} {stats.count:>9} "
+                         f"{stats.total * 1000:>10.1f} "
+                         f"{stats.own * 1000:>10.1f}")
+        return "\n".join(lines)
+
+
+def timed_render(render):
+    def _render(self, context):
+        profile = getattr(_state, "profile", None)
+        if profile is None:
+            return render(self, context)
+        stack = _state.stack
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            total = time.perf_counter() - started
+            nested = stack.pop()
+            if stack:
+                stack[-1] += total
+            profile.record(self.name or "<строка>", total, total - nested)
+    _render.profiled = True
+    return _render
+
+
+@contextmanager
+def profile_templates():
+    """Собирает статистику рендеринга шаблонов в текущем потоке::
+
+        with profile_templates() as profile:
+            client.get("/")
+        print(profile.report())
+    """
+    if not getattr(Template._render, "profiled", False):
+        Template._render = timed_render(Template._render)
+    profile = TemplateProfile()
+    _state.profile, _state.stack = profile, []
+    try:
+        yield profile
+    finally:
+        _state.profile = None
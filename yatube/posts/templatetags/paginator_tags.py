@@ -0,0 +1,15 @@
+from django import template
+
+from ..paginators import page_window as get_page_window
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page):
+    """Окно номеров страниц вокруг текущей; у страницы по курсору
+    номера нет, и окно пустое.
+    """
+    if page.number is None:
+        return []
+    return get_page_window(page.number, page.paginator.num_pages)
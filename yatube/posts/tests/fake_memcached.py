@@ -0,0 +1,191 @@
+"""Минимальный сервер с текстовым протоколом memcached для тестов.
+
+Поддерживает команды, которыми пользуется бэкенд PyMemcacheCache:
+get/gets, set/add/replace, delete, incr/decr, touch и flush_all.
+"""
+import socketserver
+import threading
+import time
+
+THIRTY_DAYS = 60 * 60 * 24 * 30
+
+
+class FakeMemcachedHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            parts = line.decode().split()
+            if not parts:
+                continue
+            command, args = parts[0], parts[1:]
+            if command == "quit":
+                return
+            handler = getattr(self, f"do_{command}", None)
+            if handler is None:
+                self.reply("ERROR")
+                continue
+            handler(args)
+
+    def reply(self, line, noreply=False):
+        if not noreply:
+            self.wfile.write(line.encode() + b"\r\n")
+
+    @property
+    def store(self):
+        return self.server.store
+
+    def do_get(self, keys, with_cas=False):
+        for key in keys:
+            item = self.store.get(key)
+            if item is None:
+                continue
+            flags, value, cas = item
+            header = f"VALUE {key} {flags} {len(value)}"
+            if with_cas:
+                header += f" {cas}"
+            self.wfile.write(header.encode() + b"\r\n" + value + b"\r\n")
+        self.reply("END")
+
+    def do_gets(self, keys):
+        self.do_get(keys, with_cas=True)
+
+    def read_value(self, size):
+        value = self.rfile.read(int(size) + 2)
+        return value[:-2]
+
+    def do_set(self, args, mode="set"):
+        key, flags, exptime, size = args[:4]
+        noreply = "noreply" in args[4:]
+        value = self.read_value(size)
+        stored = self.store.put(key, int(flags), value, int(exptime), mode)
+        self.reply("STORED" if stored else "NOT_STORED", noreply)
+
+    def do_add(self, args):
+        self.do_set(args, mode="add")
+
+    def do_replace(self, args):
+        self.do_set(args, mode="replace")
+
+    def do_delete(self, args):
+        deleted = self.store.delete(args[0])
+        self.reply("DELETED" if deleted else "NOT_FOUND", "noreply" in args)
+
+    def do_incr(self, args, sign=1):
+        value = self.store.incr(args[0], sign * int(args[1]))
+        noreply = "noreply" in args[2:]
+        self.reply("NOT_FOUND" if value is None else str(value), noreply)
+
+    def do_decr(self, args):
+        self.do_incr(args, sign=-1)
+
+    def do_touch(self, args):
+        touched = self.store.touch(args[0], int(args[1]))
+        self.reply("TOUCHED" if touched else "NOT_FOUND", "noreply" in args)
+
+    def do_flush_all(self, args):
+        self.store.clear()
+        self.reply("OK", "noreply" in args)
+
+    def do_version(self, args):
+        self.reply("VERSION fake-1.0")
+
+
+class FakeMemcachedStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = {}
+        self.cas = 0
+
+    @staticmethod
+    def expires_at(exptime):
+        if exptime == 0:
+            return None
+        if exptime < 0:
+            return 0
+        if exptime <= THIRTY_DAYS:
+            return time.time() + exptime
+        return exptime
+
+    def _live(self, key):
+        item = self.items.get(key)
+        if item is None:
+            return None
+        expires = item[3]
+        if expires is not None and expires <= time.time():
+            del self.items[key]
+            return None
+        return item
+
+    def get(self, key):
+        with self.lock:
+            item = self._live(key)
+            return item and item[:3]
+
+    def put(self, key, flags, value, exptime, mode="set"):
+        with self.lock:
+            exists = self._live(key) is not None
+            if (mode == "add" and exists) or (
+                    mode == "replace" and not exists):
+                return False
+            self.cas += 1
+            self.items[key] = (
+                flags, value, self.cas, self.expires_at(exptime))
+            return True
+
+    def delete(self, key):
+        with self.lock:
+            return self.items.pop(key, None) is not None
+
+    def incr(self, key, delta):
+        with self.lock:
+            item = self._live(key)
+            if item is None:
+                return None
+            flags, value, _, expires = item
+            value = max(int(value) + delta, 0)
+            self.cas += 1
+            self.items[key] = (flags, str(value).encode(), self.cas, expires)
+            return value
+
+    def touch(self, key, exptime):
+        with self.lock:
+            item = self._live(key)
+            if item is None:
+                return False
+            self.items[key] = item[:3] + (self.expires_at(exptime),)
+            return True
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+class FakeMemcachedServer(socketserver.ThreadingTCPServer):
+    """Запускается в фоновом потоке на свободном порту::
+
+        with FakeMemcachedServer() as server:
+            location = server.location
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), FakeMemcachedHandler)
+        self.store = FakeMemcachedStore()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def location(self):
+        host, port = self.server_address
+        return f"{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
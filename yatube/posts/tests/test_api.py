@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Group, Post
+from ..paginators import NEXT, encode_position
+
+User = get_user_model()
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.other = User.objects.create_user(username='other_user')
+        cls.group = Group.objects.create(title='Тест', slug='test-slug')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {item}', author=cls.user,
+                                group=cls.group)
+            for item in range(12)
+        ]
+        cls.other_post = Post.objects.create(
+            text='Чужой пост', author=cls.other)
+        Comment.objects.create(
+            text='Комментарий', author=cls.other, post=cls.posts[-1])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get(self, name, *args, **params):
+        return self.guest_client.get(reverse(name, args=args), params)
+
+    def test_index_returns_newest_posts_with_all_fields(self):
+        data = self.get('api_index').json()
+        self.assertEqual(len(data['results']), 10)
+        first = data['results'][0]
+        self.assertEqual(first['id'], self.other_post.pk)
+        self.assertEqual(first['author'], 'other_user')
+        self.assertIsNone(first['group'])
+        latest = data['results'][1]
+        self.assertEqual(latest['group'], 'test-slug')
+        self.assertEqual(latest['comments_count'], 1)
+
+    def test_cursor_walks_the_whole_feed(self):
+        ids = []
+        params = {'limit': 5}
+        while True:
+            data = self.get('api_profile', 'test_user', **params).json()
+            ids += [item['id'] for item in data['results']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+
+    def test_group_and_post(self):
+        data = self.get('api_group', 'test-slug', fields='id').json()
+        self.assertNotIn(self.other_post.pk,
+                         [item['id'] for item in data['results']])
+        post = self.get('api_post', self.posts[0].pk).json()
+        self.assertEqual(post['text'], 'Пост 0')
+
+    def test_field_selection_skips_unneeded_joins(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get('api_index', fields='id,text').json()
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN', queries[0]['sql'])
+
+    def test_bad_requests(self):
+        cases = (
+            (('api_index',), {'fields': 'id,password'}, 400),
+            (('api_index',), {'cursor': 'broken'}, 400),
+            (('api_index',),
+             {'cursor': encode_position(NEXT, timezone.now(), 2 ** 64)},
+             400),
+            (('api_group', 'missing'), {}, 404),
+            (('api_profile', 'missing'), {}, 404),
+            (('api_post', 0), {}, 404),
+        )
+        for args, params, status in cases:
+            with self.subTest(args=args, params=params):
+                response = self.get(*args, **params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
+
+    def test_feed_api_supports_conditional_get(self):
+        etag = self.get('api_index')['ETag']
+        response = self.guest_client.get(
+            reverse('api_index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,108 @@
+import shutil
+import tempfile
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import feed_cache
+from ..models import Post
+from .fake_memcached import FakeMemcachedServer
+
+try:
+    import pymemcache  # noqa
+except ImportError:
+    pymemcache = None
+else:
+    from django.core.cache.backends.memcached import PyMemcacheCache
+
+User = get_user_model()
+
+
+@unittest.skipUnless(pymemcache, 'pymemcache is not installed')
+class MemcachedBackendTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeMemcachedServer().__enter__()
+        cls.caches_setting = {
+            'default': {
+                'BACKEND':
+                    'django.core.cache.backends.memcached.PyMemcacheCache',
+                'LOCATION': cls.server.location,
+            }
+        }
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.server.__exit__(None, None, None)
+
+    def worker_cache(self):
+        return PyMemcacheCache(self.server.location, {})
+
+    def test_workers_share_entries(self):
+        first, second = self.worker_cache(), self.worker_cache()
+        first.set('shared', {'posts': 1})
+        self.assertEqual(second.get('shared'), {'posts': 1})
+        first.set('counter', 1)
+        self.assertEqual(second.incr('counter'), 2)
+        second.delete('shared')
+        self.assertIsNone(first.get('shared'))
+
+    def test_feed_version_bump_reaches_other_workers(self):
+        with self.settings(CACHES=self.caches_setting):
+            version = feed_cache.get_version(feed_cache.INDEX)
+            feed_cache.bump({feed_cache.INDEX})
+            self.assertEqual(
+                self.worker_cache().get(
+                    feed_cache.version_key(feed_cache.INDEX)),
+                version + 1)
+
+    def test_feed_pages_are_cached_in_shared_backend(self):
+        with self.settings(CACHES=self.caches_setting):
+            cache.clear()
+            client = Client()
+            Post.objects.create(text='Первый пост', author=self.user)
+            client.get(reverse('index'))
+            Post.objects.create(text='Второй пост', author=self.user)
+            self.assertContains(client.get(reverse('index')), 'Второй пост')
+
+
+class FileBasedBackendTest(TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+
+    def test_workers_share_entries(self):
+        first = FileBasedCache(self.location, {})
+        second = FileBasedCache(self.location, {})
+        first.set('shared', {'posts': 1})
+        self.assertEqual(second.get('shared'), {'posts': 1})
+        second.delete('shared')
+        self.assertIsNone(first.get('shared'))
+
+
+class FileBasedFeedCacheTest(TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+
+    def test_feed_version_bump_reaches_other_workers(self):
+        caches_setting = {
+            'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': self.location,
+            }
+        }
+        with self.settings(CACHES=caches_setting):
+            version = feed_cache.get_version(feed_cache.INDEX)
+            feed_cache.bump({feed_cache.INDEX})
+        other = FileBasedCache(self.location, {})
+        self.assertEqual(
+            other.get(feed_cache.version_key(feed_cache.INDEX)), version + 1)
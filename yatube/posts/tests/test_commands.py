@@ -0,0 +1,235 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..management.commands.benchmark import find_regressions
+from ..models import Comment, Counter, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class ExplainFeedsCommandTest(TestCase):
+    def test_prints_plan_for_every_feed_query(self):
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        output = out.getvalue()
+        for name in ('index', 'group', 'profile', 'post', 'comments'):
+            with self.subTest(name=name):
+                self.assertIn(f'{name}:', output)
+        self.assertIn('post_pub_date_idx', output)
+
+
+class ProfileTemplatesCommandTest(TestCase):
+    def test_prints_render_time_per_template(self):
+        user = User.objects.create_user(username='test_user')
+        Post.objects.create(text='Тестовый текст', author=user)
+        out = StringIO()
+        call_command('profile_templates', '/', '/test_user/',
+                     '--repeat', '2', stdout=out)
+        self.assertIn('posts/post_item.html', out.getvalue())
+        self.assertIn('profile.html', out.getvalue())
+
+    def test_keeps_cache_by_default(self):
+        cache.set('shared', 'value')
+        call_command('profile_templates', '/', '--repeat', '1',
+                     stdout=StringIO())
+        self.assertEqual(cache.get('shared'), 'value')
+
+
+class BenchmarkProfilesCommandTest(TestCase):
+    def test_measures_current_profile(self):
+        user = User.objects.create_user(username='test_user')
+        Post.objects.create(text='Тестовый текст', author=user)
+        out = StringIO()
+        call_command('benchmark_profiles', '--run', '--requests', '2',
+                     '--warmup', '1', stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertIn('/test_user/', result['urls'])
+        for rps in result['urls'].values():
+            self.assertGreater(rps, 0)
+
+
+class BenchmarkCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_saves_baseline_for_every_endpoint(self):
+        path = os.path.join(self.directory, 'baseline.json')
+        call_command('benchmark', '--users', '2', '--groups', '1',
+                     '--posts', '5', '--comments', '5', '--requests', '3',
+                     '--concurrency', '2', '--baseline', path, '--save',
+                     stdout=StringIO())
+        with open(path, encoding='utf-8') as source:
+            baseline = json.load(source)
+        self.assertEqual(
+            list(baseline['endpoints']),
+            ['index', 'group', 'profile', 'post', 'post_new', 'add_comment'])
+        for stats in baseline['endpoints'].values():
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+            self.assertGreater(stats['queries_per_request'], 0)
+
+    def test_reports_regressions(self):
+        stats = {'p95_ms': 10, 'rps': 100, 'queries_per_request': 5}
+        baseline = {'endpoints': {'index': stats}}
+        self.assertEqual(find_regressions(
+            baseline, {'endpoints': {'index': dict(stats, p95_ms=11)}},
+            tolerance=0.25), [])
+        slower = dict(stats, p95_ms=20, rps=50, queries_per_request=6)
+        self.assertEqual(len(find_regressions(
+            baseline, {'endpoints': {'index': slower}}, tolerance=0.25)), 3)
+
+
+class RecountCommandTest(TestCase):
+    def test_repairs_drifted_counters(self):
+        user = User.objects.create_user(username='test_user')
+        group = Group.objects.create(title='Тест', slug='test-slug')
+        post = Post.objects.create(
+            text='Тестовый текст', author=user, group=group)
+        Comment.objects.create(text='Комментарий', author=user, post=post)
+        Counter.objects.all().update(value=100)
+        Group.objects.update(posts_count=100)
+        Post.objects.update(comments_count=100)
+
+        call_command('recount', stdout=StringIO())
+
+        group.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Counter.objects.value(Counter.TOTAL_POSTS), 1)
+        self.assertEqual(
+            Counter.objects.value(Counter.author_posts(user.pk)), 1)
+
+    def test_repairs_follow_counters(self):
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='author')
+        Follow.objects.follow(reader, author)
+        Counter.objects.all().update(value=100)
+        Counter.objects.filter(
+            name=Counter.user_follows(reader.pk)).delete()
+
+        call_command('recount', stdout=StringIO())
+
+        self.assertEqual(
+            Counter.objects.value(Counter.author_followers(author.pk)), 1)
+        self.assertEqual(
+            Counter.objects.value(Counter.user_follows(reader.pk)), 1)
+        self.assertEqual(
+            Counter.objects.value(Counter.author_followers(reader.pk)), 0)
+
+
+class ExportDataCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(title='Тест', slug='test-slug')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {item}', author=cls.user,
+                                group=cls.group)
+            for item in range(5)
+        ]
+        Comment.objects.create(
+            text='Комментарий', author=cls.user, post=cls.posts[0])
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('export_data', *args, stdout=out)
+        return out.getvalue()
+
+    def test_jsonl_export_is_resumable_by_id(self):
+        rows = [json.loads(line) for line in self.export(
+            'posts', '--chunk-size', '2').splitlines()]
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts])
+        self.assertEqual(rows[0]['author'], 'test_user')
+        self.assertEqual(rows[0]['group'], 'test-slug')
+        rest = [json.loads(line) for line in self.export(
+            'posts', '--after-id', str(rows[2]['id'])).splitlines()]
+        self.assertEqual(rest, rows[3:])
+
+    def test_csv_export_has_header(self):
+        rows = list(csv.reader(StringIO(
+            self.export('comments', '--format', 'csv'))))
+        self.assertEqual(rows[0], ['id', 'post', 'author', 'text',
+                                   'created'])
+        self.assertEqual(rows[1][1:4],
+                         [str(self.posts[0].pk), 'test_user', 'Комментарий'])
+
+
+class ImportDataCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write_jsonl(self, name, rows):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            for row in rows:
+                output.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return path
+
+    def load(self, *args):
+        call_command('import_data', *args, stdout=StringIO(),
+                     stderr=StringIO())
+
+    def test_imports_groups_posts_and_comments(self):
+        self.load('groups', self.write_jsonl('groups.jsonl', [
+            {'title': 'Тест', 'slug': 'test-slug', 'description': ''},
+        ]))
+        self.load('posts', self.write_jsonl('posts.jsonl', [
+            {'id': 100 + item, 'author': 'test_user', 'group': 'test-slug',
+             'text': f'Пост {item}', 'pub_date': '2020-01-0{}T10:00:00'
+             .format(item + 1)}
+            for item in range(3)
+        ] + [{'author': 'nobody', 'text': 'Без автора'}]),
+            '--batch-size', '2')
+        self.load('comments', self.write_jsonl('comments.jsonl', [
+            {'post': 100, 'author': 'test_user', 'text': 'Комментарий'},
+            {'post': 999, 'author': 'test_user', 'text': 'Мимо'},
+        ]))
+
+        group = Group.objects.get(slug='test-slug')
+        self.assertEqual(group.posts_count, 3)
+        self.assertEqual(Post.objects.count(), 3)
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(
+            Counter.objects.value(Counter.author_posts(self.user.pk)), 3)
+
+    def test_csv_import_can_create_authors(self):
+        path = os.path.join(self.directory, 'posts.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as output:
+            writer = csv.writer(output)
+            writer.writerow(['author', 'group', 'text', 'pub_date'])
+            writer.writerow(['new_author', '', 'Пост из CSV', ''])
+        self.load('posts', path, '--create-authors')
+        post = Post.objects.get()
+        self.assertEqual(post.author.username, 'new_author')
+        self.assertIsNone(post.group)
+
+    def test_posts_without_id_reach_timelines(self):
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.follow(follower, self.user)
+        self.load('posts', self.write_jsonl('posts.jsonl', [
+            {'author': 'test_user', 'text': f'Пост {item}'}
+            for item in range(3)
+        ]), '--batch-size', '2')
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follower).count(), 3)
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, TestCase, override_settings
+from django.urls import path, reverse
+from yatube.urls import urlpatterns as project_urlpatterns
+
+from ..metrics import Histogram, registry
+from ..models import Post
+
+User = get_user_model()
+
+
+def unnamed_view(request):
+    return HttpResponse()
+
+
+urlpatterns = [path('unnamed/', unnamed_view), *project_urlpatterns]
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.staff = User.objects.create_user(username='staff',
+                                             is_staff=True)
+        Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.guest_client = Client()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_server_timing_breaks_down_request(self):
+        response = self.guest_client.get(reverse('index'))
+        timings = dict(
+            item.split(';dur=')
+            for item in response['Server-Timing'].split(', '))
+        self.assertEqual(list(timings),
+                         ['db', 'template', 'thumbnail', 'cache', 'total'])
+        for part in ('db', 'template', 'cache', 'total'):
+            with self.subTest(part=part):
+                self.assertGreater(float(timings[part]), 0)
+
+    def test_metrics_are_collected_per_url_name(self):
+        self.guest_client.get(reverse('index'))
+        self.guest_client.get(reverse('profile', args=['test_user']))
+        response = self.staff_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn(
+            'yatube_request_seconds_count{view="index",part="total"} 1',
+            body)
+        self.assertIn('view="profile",part="db",le="+Inf"} 1', body)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_routes_without_name_are_labelled_by_view(self):
+        self.guest_client.get('/unnamed/')
+        response = self.staff_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'view="{__name__}.unnamed_view"',
+                      response.content.decode())
+
+    def test_metrics_are_staff_only(self):
+        reader = Client()
+        reader.force_login(self.user)
+        for client in (self.guest_client, reader):
+            with self.subTest(client=client):
+                response = client.get(reverse('metrics'))
+                self.assertEqual(response.status_code, 403)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram(buckets=(0.1, 1))
+        for value in (0.05, 0.5, 2):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.samples()),
+                         [('0.1', 1), ('1', 2), ('+Inf', 3)])
+        self.assertAlmostEqual(histogram.sum, 2.55)
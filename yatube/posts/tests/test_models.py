@@ -1,6 +1,9 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Counter, Follow, Group, Post
+
+User = get_user_model()
 
 
 class PostModelTest(TestCase):
@@ -25,3 +28,104 @@ class PostModelTest(TestCase):
         post = PostModelTest.post
         expected_object_name = post.text[:15]
         self.assertEqual(expected_object_name, str(post))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(title='Первая', slug='first')
+        cls.other_group = Group.objects.create(title='Вторая', slug='second')
+
+    def author_posts(self):
+        return Counter.objects.value(Counter.author_posts(self.user.pk))
+
+    def test_post_counters_follow_create_edit_and_delete(self):
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.user, group=self.group)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.author_posts(), 1)
+        self.assertEqual(Counter.objects.value(Counter.TOTAL_POSTS), 1)
+
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        self.assertEqual(Counter.objects.value(Counter.TOTAL_POSTS), 1)
+
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.other_group.posts_count, 0)
+        self.assertEqual(self.author_posts(), 0)
+        self.assertEqual(Counter.objects.value(Counter.TOTAL_POSTS), 0)
+
+    def test_bulk_create_updates_counters(self):
+        Post.objects.bulk_create([
+            Post(text='Тестовый текст', author=self.user, group=self.group)
+            for _ in range(3)
+        ])
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
+        self.assertEqual(self.author_posts(), 3)
+
+    def test_bulk_create_does_not_reuse_deleted_ids(self):
+        deleted = Post.objects.create(text='Удалённый', author=self.user)
+        deleted_pk = deleted.pk
+        deleted.delete()
+        post, = Post.objects.bulk_create([
+            Post(text='Тестовый текст', author=self.user)])
+        self.assertGreater(post.pk, deleted_pk)
+        self.assertEqual(Post.objects.get().pk, post.pk)
+
+    def test_follow_counters_follow_follow_and_unfollow(self):
+        author = User.objects.create_user(username='author')
+        Follow.objects.follow(self.user, author)
+        Follow.objects.follow(self.user, author)
+        counters = Counter.objects.value_many([
+            Counter.author_followers(author.pk),
+            Counter.user_follows(self.user.pk),
+        ])
+        self.assertEqual(list(counters.values()), [1, 1])
+
+        Follow.objects.unfollow(self.user, author)
+        self.assertEqual(
+            Counter.objects.value(Counter.author_followers(author.pk)), 0)
+        self.assertEqual(
+            Counter.objects.value(Counter.user_follows(self.user.pk)), 0)
+
+    def test_comments_count_follows_create_and_delete(self):
+        post = Post.objects.create(text='Тестовый текст', author=self.user)
+        comment = Comment.objects.create(
+            text='Комментарий', author=self.user, post=post)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_comment_bulk_create_updates_counters_in_one_query(self):
+        posts = [Post.objects.create(text='Тестовый текст', author=self.user)
+                 for _ in range(3)]
+        with self.assertNumQueries(3):
+            Comment.objects.bulk_create([
+                Comment(text='Комментарий', author=self.user, post=post)
+                for post in posts for _ in range(post.pk)
+            ])
+        for post in posts:
+            post.refresh_from_db()
+            self.assertEqual(post.comments_count, post.pk)
+
+    def test_post_with_comments_is_deleted_in_constant_queries(self):
+        post = Post.objects.create(text='Тестовый текст', author=self.user)
+        Comment.objects.bulk_create([
+            Comment(text='Комментарий', author=self.user, post=post)
+            for _ in range(100)
+        ])
+        with self.assertNumQueries(6):
+            post.delete()
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(self.author_posts(), 0)
@@ -0,0 +1,112 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import thumbnails
+from ..models import Comment, Follow, Group, Post, PostQuerySet
+from ..query_budget import (QueryBudgetExceeded, QueryBudgetTestMixin,
+                            QueryRecorder)
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C\x0A\x00\x3B'
+)
+
+
+def feed_without_joins(self):
+    return self.all()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Тест', slug='test-slug')
+        Follow.objects.follow(cls.reader, cls.author)
+        for item in range(5):
+            cls.post = Post.objects.create(
+                text=f'Пост {item}', author=cls.author, group=cls.group)
+            for user in (cls.author, cls.reader):
+                Comment.objects.create(
+                    text='Комментарий', author=user, post=cls.post)
+        # Пост с картинкой: лентам нужен запрос к хранилищу миниатюр.
+        cls.post = Post.objects.create(
+            text='Пост с картинкой', author=cls.author, group=cls.group,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        patcher = mock.patch.object(thumbnails, 'schedule')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        self.clients = {'guest': Client(), 'reader': Client()}
+        self.clients['reader'].force_login(self.reader)
+
+    def test_pages_fit_their_budgets(self):
+        urls = (
+            reverse('index'),
+            reverse('group', args=['test-slug']),
+            reverse('profile', args=['author']),
+            reverse('post', args=['author', self.post.pk]),
+            reverse('post_comments', args=['author', self.post.pk]),
+        )
+        for name, client in self.clients.items():
+            for url in urls:
+                with self.subTest(client=name, url=url):
+                    self.assertEqual(client.get(url).status_code, 200)
+        response = self.clients['reader'].get(reverse('follow_index'))
+        self.assertEqual(response.status_code, 200)
+
+    @mock.patch.object(QueryRecorder, 'time_ms',
+                       new_callable=mock.PropertyMock, return_value=1000)
+    def test_slow_queries_are_only_logged(self, time_ms):
+        with self.assertLogs('posts.query_budget', 'WARNING') as logs:
+            response = self.clients['guest'].get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('превысил бюджет времени', logs.output[0])
+
+    def test_request_queries_are_recorded(self):
+        response = self.clients['guest'].get(reverse('index'))
+        recorder = response.wsgi_request.query_recorder
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(recorder.duplicates(), {})
+
+    @mock.patch.object(PostQuerySet, 'feed', feed_without_joins)
+    def test_n_plus_one_in_feed_raises(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'index'):
+            self.clients['guest'].get(reverse('index'))
+
+    @override_settings(QUERY_BUDGET_RAISE=False)
+    @mock.patch.object(PostQuerySet, 'feed', feed_without_joins)
+    def test_n_plus_one_is_logged_without_raise(self):
+        with self.assertLogs('posts.query_budget', 'WARNING') as logs:
+            response = self.clients['guest'].get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('превысил бюджет запросов', logs.output[0])
+
+    def test_assert_query_budget_reports_duplicates(self):
+        with self.assertRaisesMessage(AssertionError, '5 раз'):
+            with self.assertQueryBudget():
+                for comment in Comment.objects.filter(author=self.author):
+                    comment.post.text
+        with self.assertQueryBudget(queries=1):
+            list(Comment.objects.select_related('post'))
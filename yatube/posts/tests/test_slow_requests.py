@@ -0,0 +1,70 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import views
+from ..models import Post
+from ..slow_requests import Sampler
+
+User = get_user_model()
+
+render = views.render
+
+
+def slow_render(*args, **kwargs):
+    time.sleep(0.05)
+    return render(*args, **kwargs)
+
+
+class SlowRequestProfilerTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    @mock.patch('posts.views.render', slow_render)
+    def test_writes_collapsed_stacks_of_slow_request(self):
+        with override_settings(SLOW_REQUEST_PROFILE_DIR=self.directory,
+                               SLOW_REQUEST_THRESHOLD=0.01,
+                               SLOW_REQUEST_SAMPLE_INTERVAL=0.001):
+            with self.assertLogs('posts.slow_requests', 'WARNING'):
+                Client().get(reverse('profile', args=['test_user']))
+        [name] = os.listdir(self.directory)
+        self.assertIn('-profile-', name)
+        with open(os.path.join(self.directory, name),
+                  encoding='utf-8') as source:
+            lines = source.read().splitlines()
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+        self.assertIn('posts.views:profile', stack)
+        self.assertTrue(stack.endswith('slow_render'))
+
+    def test_fast_requests_leave_no_files(self):
+        with override_settings(SLOW_REQUEST_PROFILE_DIR=self.directory,
+                               SLOW_REQUEST_THRESHOLD=10):
+            Client().get(reverse('index'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_idle_sampler_does_not_take_stacks(self):
+        sampler = Sampler(0.001)
+        sampler.watch(threading.get_ident())
+        time.sleep(0.01)
+        sampler.unwatch(threading.get_ident())
+        time.sleep(0.01)
+        with mock.patch.object(sys, '_current_frames',
+                               wraps=sys._current_frames) as frames:
+            time.sleep(0.05)
+        frames.assert_not_called()
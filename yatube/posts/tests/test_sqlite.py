@@ -0,0 +1,46 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ..models import Counter
+
+
+class SqlitePragmasTest(SimpleTestCase):
+    databases = {'default'}
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -2048,
+                                       'synchronous': 'OFF'})
+    def test_new_connection_gets_pragmas_from_settings(self):
+        connection = connections.create_connection('default')
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size')
+                self.assertEqual(cursor.fetchone()[0], -2048)
+                cursor.execute('PRAGMA synchronous')
+                self.assertEqual(cursor.fetchone()[0], 0)
+        finally:
+            connection.close()
+
+
+class ImmediateTransactionsTest(TransactionTestCase):
+    def test_atomic_blocks_take_write_lock_at_begin(self):
+        with CaptureQueriesContext(connection) as queries:
+            Counter.objects.incr('test')
+        self.assertIn('BEGIN IMMEDIATE',
+                      [query['sql'] for query in queries.captured_queries])
+
+
+class StressSqliteCommandTest(SimpleTestCase):
+    def test_tuned_connections_are_not_locked(self):
+        out = StringIO()
+        call_command('stress_sqlite', '--seconds', '0.5', '--writers', '2',
+                     '--readers', '1', stdout=out)
+        rows = dict(line.split(maxsplit=1)
+                    for line in out.getvalue().splitlines()[1:])
+        self.assertEqual(set(rows), {'before', 'after'})
+        writes, reads, locked = rows['after'].split()
+        self.assertGreater(float(writes), 0)
+        self.assertEqual(locked, '0')
@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import Client, TestCase
+
+from ..models import Post
+from ..template_profiler import profile_templates
+
+User = get_user_model()
+
+
+class TemplateProfilerTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        Post.objects.bulk_create([
+            Post(text=f'Пост {item}', author=cls.user) for item in range(3)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_records_pages_and_includes(self):
+        with profile_templates() as profile:
+            Client().get('/')
+        self.assertEqual(profile.templates['posts/post_item.html'].count, 3)
+        for name in ('posts/index.html', 'includes/base.html',
+                     'includes/paginator.html', 'includes/nav.html'):
+            self.assertIn(name, profile.templates)
+        self.assertIn('posts/post_item.html', profile.report())
+
+    def test_own_time_excludes_nested_templates(self):
+        with profile_templates() as profile:
+            Client().get('/')
+        base = profile.templates['includes/base.html']
+        self.assertLess(base.own, base.total)
+        for stats in profile.templates.values():
+            self.assertGreaterEqual(stats.own, 0)
+
+    def test_nothing_is_recorded_outside_profiling(self):
+        with profile_templates() as profile:
+            pass
+        Template('{{ value }}').render(Context({'value': 1}))
+        self.assertEqual(profile.templates, {})
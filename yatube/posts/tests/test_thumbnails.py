@@ -0,0 +1,135 @@
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import feed_cache, thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def create_post(self):
+        return Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'),
+        )
+
+    def test_saving_post_schedules_configured_sizes(self):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                post = self.create_post()
+        for geometry, options in settings.THUMBNAIL_PRESETS:
+            schedule.assert_any_call(post.image.name, geometry, options,
+                                     feed_cache.post_scopes(post))
+
+    def test_missing_thumbnail_is_not_resized_in_request(self):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            post = self.create_post()
+            response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, post.image.url)
+        schedule.assert_called_once_with(
+            post.image.name, '960x339', {'crop': 'center', 'upscale': True},
+            feed_cache.post_scopes(post))
+
+    @override_settings(THUMBNAIL_ASYNC=False)
+    def test_pregenerated_thumbnail_is_served_from_store(self):
+        with mock.patch.object(thumbnails, 'schedule'):
+            post = self.create_post()
+        thumbnails.pregenerate(post.image.name)
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            response = self.guest_client.get(reverse('index'))
+        schedule.assert_not_called()
+        self.assertNotContains(response, post.image.url)
+        self.assertContains(response, settings.MEDIA_URL + 'cache/')
+
+    def test_finished_job_invalidates_feeds_with_fallback_url(self):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            post = self.create_post()
+            response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, post.image.url)
+        scopes = feed_cache.post_scopes(post)
+        versions = {scope: feed_cache.get_version(scope) for scope in scopes}
+        with mock.patch.object(thumbnails, 'close_old_connections'), \
+                CaptureQueriesContext(connection) as queries:
+            thumbnails.run_job(*schedule.call_args.args)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'posts_post' in query['sql']])
+        for scope in scopes:
+            with self.subTest(scope=scope):
+                self.assertNotEqual(
+                    feed_cache.get_version(scope), versions[scope])
+        response = self.guest_client.get(reverse('index'))
+        self.assertNotContains(response, post.image.url)
+
+    def test_job_is_queued_once_while_running(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_render(*args):
+            started.set()
+            release.wait(5)
+
+        with mock.patch.object(thumbnails, 'render',
+                               side_effect=slow_render) as render:
+            thumbnails.schedule('posts/a.gif', '960x339', {})
+            started.wait(5)
+            thumbnails.schedule('posts/a.gif', '960x339', {})
+            release.set()
+            thumbnails.wait_for_pending(5)
+        render.assert_called_once()
+
+    @override_settings(THUMBNAIL_ASYNC=False)
+    def test_feed_page_reads_thumbnails_in_one_query(self):
+        with mock.patch.object(thumbnails, 'schedule'):
+            posts = [self.create_post() for _ in range(3)]
+        for post in posts:
+            thumbnails.pregenerate(post.image.name)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(reverse('index'))
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        for post in response.context['page']:
+            with self.subTest(post=post.pk):
+                self.assertIn('/cache/', post.thumb_url)
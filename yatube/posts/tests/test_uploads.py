@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+from ..uploads import ImageUploadHandler
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(size=(300, 200), image_format='JPEG', orientation=None):
+    output = BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    Image.new('RGB', size, 'red').save(output, image_format,
+                                       exif=exif.tobytes())
+    return output.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_UPLOAD_ASYNC=False,
+                   IMAGE_MAX_SIDE=100)
+@mock.patch.object(thumbnails, 'schedule')
+class ImageUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def post_image(self, content, name='photo.jpg'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('post_new'), {
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(name, content, 'image/jpeg'),
+            })
+
+    def test_image_is_reencoded_after_commit(self, schedule):
+        response = self.post_image(make_image(orientation=6))
+        self.assertRedirects(response, reverse('index'))
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.startswith('posts/photo'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            # Развёрнута по EXIF и уменьшена до IMAGE_MAX_SIDE.
+            self.assertEqual(image.size, (67, 100))
+            self.assertEqual(len(image.getexif()), 0)
+        self.assertEqual(
+            os.listdir(os.path.join(MEDIA_ROOT, 'uploads')), [])
+        schedule.assert_called()
+
+    def test_rejected_uploads_show_error(self, schedule):
+        cases = (
+            ({'IMAGE_UPLOAD_MAX_BYTES': 1000}, make_image((600, 600)),
+             'Картинка больше'),
+            ({'IMAGE_UPLOAD_MAX_PIXELS': 100}, make_image(),
+             'мегапикселей'),
+            ({}, b'not an image at all', 'Загрузите картинку'),
+            ({'IMAGE_UPLOAD_FORMATS': ('PNG',)}, make_image(),
+             'в формате PNG'),
+        )
+        for limits, content, message in cases:
+            with self.subTest(message=message), override_settings(**limits):
+                response = self.post_image(content)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, message)
+                self.assertFalse(Post.objects.exists())
+
+    def test_post_without_image(self, schedule):
+        self.client.post(reverse('post_new'), {'text': 'Без картинки'})
+        self.assertFalse(Post.objects.get().image)
+
+
+class ImageUploadHandlerTest(TestCase):
+    def start(self, handler, content_length):
+        handler.handle_raw_input(None, {}, content_length, 'boundary')
+        handler.new_file('image', 'photo.png', 'image/png', None)
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100 * 100)
+    def test_rejects_by_header_before_body_is_read(self):
+        content = make_image((1000, 1000), 'PNG')
+        request = RequestFactory().post('/')
+        handler = ImageUploadHandler(request)
+        self.start(handler, len(content))
+        with self.assertRaises(StopUpload):
+            handler.receive_data_chunk(content[:1024], 0)
+        self.assertIn('мегапикселей', request.upload_error)
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=1000)
+    def test_rejects_oversized_body_at_first_byte(self):
+        request = RequestFactory().post('/')
+        handler = ImageUploadHandler(request)
+        handler.handle_raw_input(None, {}, 10 ** 9, 'boundary')
+        with self.assertRaises(StopUpload):
+            handler.new_file('image', 'photo.png', 'image/png', None)
+        self.assertIn('Картинка больше', request.upload_error)
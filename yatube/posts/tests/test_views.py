@@ -1,18 +1,27 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from ..models import Group, Post
+from .. import feed_cache, thumbnails
+from ..models import (Comment, Counter, Follow, Group, Post,
+                      TimelineEntry)
+from ..paginators import NEXT, encode_position, page_window
 
 User = get_user_model()
 
 
+@override_settings(THUMBNAIL_ASYNC=False)
 class TaskPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -50,6 +59,10 @@ class TaskPagesTests(TestCase):
         super().tearDownClass()
 
     def setUp(self):
+        # Миниатюры не строятся: страницы отдают исходную картинку.
+        patcher = mock.patch.object(thumbnails, 'schedule')
+        patcher.start()
+        self.addCleanup(patcher.stop)
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -190,3 +203,528 @@ class PaginatorViewsTest(TestCase):
             len(response_second_page.context.get('page').object_list),
             3
         )
+
+
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(title='Cursor', slug='cursor-slug')
+        Post.objects.bulk_create([
+            Post(text=f"Тестовый текст номер {item}",
+                 author=cls.user, group=cls.group) for item in range(23)
+        ])
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_cursor_pages_walk_the_whole_feed(self):
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True))
+        seen = []
+        page = self.guest_client.get(reverse('index')).context['page']
+        seen.extend(post.pk for post in page)
+        while page.next_cursor:
+            response = self.guest_client.get(
+                reverse('index'), {'cursor': page.next_cursor})
+            page = response.context['page']
+            seen.extend(post.pk for post in page)
+        self.assertEqual(seen, expected)
+        self.assertFalse(page.has_next())
+
+    def test_cursor_page_runs_no_count(self):
+        first_page = self.guest_client.get(
+            reverse('group', args=['cursor-slug'])).context['page']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(
+                reverse('group', args=['cursor-slug']),
+                {'cursor': first_page.next_cursor})
+        self.assertEqual(len(response.context['page']), 10)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(*)', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_previous_cursor_returns_previous_page(self):
+        first_page = self.guest_client.get(reverse('index')).context['page']
+        second_page = self.guest_client.get(
+            reverse('index'),
+            {'cursor': first_page.next_cursor}).context['page']
+        back = self.guest_client.get(
+            reverse('index'),
+            {'cursor': second_page.previous_cursor}).context['page']
+        self.assertEqual(list(back), list(first_page))
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        out_of_range = encode_position(NEXT, timezone.now(), 2 ** 64)
+        for cursor in ('xx', out_of_range):
+            with self.subTest(cursor=cursor):
+                response = self.guest_client.get(
+                    reverse('index'), {'cursor': cursor})
+                self.assertEqual(len(response.context['page']), 10)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(title='Feed', slug='feed-slug')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def add_posts(self, num):
+        posts = [
+            Post.objects.create(text=f"Тестовый текст номер {item}",
+                                author=self.user, group=self.group)
+            for item in range(num)
+        ]
+        Comment.objects.bulk_create([
+            Comment(text='Комментарий', author=self.user, post=post)
+            for post in posts
+        ])
+
+    def test_feed_pages_run_fixed_number_of_queries(self):
+        urls = (
+            (reverse('index'), 2),
+            (reverse('group', args=['feed-slug']), 3),
+            (reverse('profile', args=['test_user']), 4),
+        )
+        for num in (1, 10):
+            self.add_posts(num)
+            for url, queries in urls:
+                with self.subTest(url=url, posts=num):
+                    with self.assertNumQueries(queries):
+                        self.guest_client.get(url)
+
+    def test_profile_queries_do_not_depend_on_follows(self):
+        self.add_posts(1)
+        url = reverse('profile', args=['test_user'])
+        for num, total in ((1, 1), (20, 21)):
+            for item in range(num):
+                reader = User.objects.create_user(username=f'{total}_{item}')
+                Follow.objects.follow(reader, self.user)
+            cache.clear()
+            with self.subTest(followers=total):
+                with self.assertNumQueries(4):
+                    response = self.guest_client.get(url)
+                self.assertContains(response, f'Подписчиков: {total}')
+
+    def test_feed_cards_show_comments_count(self):
+        self.add_posts(1)
+        response = self.guest_client.get(reverse('index'))
+        self.assertEqual(response.context['page'][0].comments_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
+
+
+class FeedCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(title='Кеш', slug='cache-slug')
+        cls.post = Post.objects.create(
+            text='Закешированный пост', author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.feed_urls = (
+            reverse('index'),
+            reverse('group', args=['cache-slug']),
+            reverse('profile', args=['test_user']),
+        )
+
+    def test_cached_page_skips_posts_query(self):
+        self.guest_client.get(reverse('index'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Закешированный пост')
+        for query in queries.captured_queries:
+            self.assertNotIn('FROM "posts_post"', query['sql'])
+
+    def test_edit_invalidates_author_group_and_index_pages(self):
+        for url in self.feed_urls:
+            self.guest_client.get(url)
+        self.authorized_client.post(
+            reverse('post_edit', args=['test_user', self.post.pk]),
+            {'text': 'Исправленный пост', 'group': self.group.pk})
+        for url in self.feed_urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Исправленный пост')
+
+    def test_new_post_invalidates_index(self):
+        self.guest_client.get(reverse('index'))
+        self.authorized_client.post(
+            reverse('post_new'), {'text': 'Свежий пост'})
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Свежий пост')
+
+    def test_comment_invalidates_index(self):
+        self.guest_client.get(reverse('index'))
+        self.authorized_client.post(
+            reverse('add_comment', args=['test_user', self.post.pk]),
+            {'text': 'Комментарий'})
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_unrelated_group_keeps_its_cache(self):
+        other = Group.objects.create(title='Другая', slug='other-slug')
+        Post.objects.create(text='Пост', author=self.user, group=other)
+        url = reverse('group', args=['other-slug'])
+        self.guest_client.get(url)
+        Post.objects.create(text='Ещё пост', author=self.user,
+                            group=self.group)
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url)
+        for query in queries.captured_queries:
+            self.assertNotIn('FROM "posts_post"', query['sql'])
+
+
+class ExportViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        for item in range(3):
+            Post.objects.create(text=f'Пост {item}', author=cls.user)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_export_requires_login(self):
+        response = Client().get(reverse('export', args=['posts']))
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_is_streamed(self):
+        response = self.authorized_client.get(
+            reverse('export', args=['posts']))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+
+    def test_export_resumes_after_id(self):
+        first = Post.objects.order_by('pk').first()
+        response = self.authorized_client.get(
+            reverse('export', args=['posts']),
+            {'format': 'csv', 'after': first.pk})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+
+    def test_unknown_export_is_404(self):
+        response = self.authorized_client.get(
+            reverse('export', args=['users']))
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.cats = Post.objects.create(
+            text='Коты спят на подоконнике', author=cls.user)
+        cls.dogs = Post.objects.create(
+            text='Собаки гуляют, коты смотрят', author=cls.user)
+        Post.objects.bulk_create([
+            Post(text=f'Посторонний текст {item}', author=cls.user)
+            for item in range(12)
+        ])
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(
+            reverse('search'), {'q': query, **params})
+        return response, list(response.context['page'])
+
+    def test_finds_all_words_by_prefix(self):
+        _, posts = self.search('кот')
+        self.assertCountEqual(posts, [self.cats, self.dogs])
+        _, posts = self.search('коты подоконник')
+        self.assertEqual(posts, [self.cats])
+
+    def test_index_follows_edit_and_delete(self):
+        self.cats.text = 'Хомяки'
+        self.cats.save()
+        self.assertEqual(self.search('хомяк')[1], [self.cats])
+        self.assertEqual(self.search('подоконник')[1], [])
+        self.dogs.delete()
+        self.assertEqual(self.search('собаки')[1], [])
+
+    def test_results_are_paginated_with_query_in_links(self):
+        response, posts = self.search('посторонний')
+        self.assertEqual(len(posts), 10)
+        self.assertEqual(response.context['page'].paginator.count, 12)
+        self.assertContains(response, '?q=%D0%BF%D0%BE%D1%81%D1%82')
+        _, posts = self.search('посторонний', page=2)
+        self.assertEqual(len(posts), 2)
+
+    def test_fts_operators_in_query_are_plain_words(self):
+        response, posts = self.search('коты OR "NEAR(')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(posts, [])
+
+
+class FollowViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow(self, author):
+        return self.client.get(
+            reverse('profile_follow', args=[author.username]))
+
+    def feed(self):
+        return list(
+            entry.post for entry in
+            self.client.get(reverse('follow_index')).context['page'])
+
+    def test_follow_and_unfollow(self):
+        response = self.follow(self.author)
+        self.assertRedirects(response, reverse('profile', args=['author']))
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+        response = self.client.get(reverse('profile', args=['author']))
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertTrue(response.context['following'])
+        self.client.get(reverse('profile_unfollow', args=['author']))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(self.feed(), [])
+
+    def test_cannot_follow_self_or_twice(self):
+        self.follow(self.reader)
+        self.follow(self.author)
+        self.follow(self.author)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_new_post_is_fanned_out_to_followers_only(self):
+        self.follow(self.author)
+        self.assertEqual(self.feed(), [self.old_post])
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        Post.objects.create(text='Чужой пост', author=self.stranger)
+        self.assertEqual(self.feed(), [post, self.old_post])
+        self.assertEqual(TimelineEntry.objects.count(), 2)
+
+    def test_feed_page_reads_timeline_without_joining_follows(self):
+        self.follow(self.author)
+        with CaptureQueriesContext(connection) as queries:
+            self.feed()
+        page_query = queries.captured_queries[-1]['sql']
+        self.assertIn('posts_timelineentry', page_query)
+        self.assertNotIn('posts_follow', page_query)
+
+    @override_settings(FOLLOW_FAN_OUT_LIMIT=2)
+    def test_heavy_author_is_pulled_on_read(self):
+        self.follow(self.author)
+        stranger_client = Client()
+        stranger_client.force_login(self.stranger)
+        stranger_client.get(reverse('profile_follow', args=['author']))
+        self.assertFalse(Follow.objects.filter(
+            author=self.author, fan_out_on_read=False).exists())
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(post.timeline_entries.exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+        self.assertEqual(self.feed(), [post, self.old_post])
+        self.assertEqual(post.timeline_entries.count(), 1)
+
+    @override_settings(FOLLOW_FAN_OUT_LIMIT=1)
+    def test_heavy_authors_are_pulled_with_one_update(self):
+        self.follow(self.author)
+        self.follow(self.stranger)
+        posts = [Post.objects.create(text='Новый пост', author=author)
+                 for author in (self.author, self.stranger)]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(self.feed()), 3)
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(
+            len([sql for sql in statements
+                 if sql.startswith('UPDATE "posts_follow"')]), 1)
+        self.assertFalse(
+            [sql for sql in statements if 'COUNT(' in sql])
+        for post in posts:
+            with self.subTest(author=post.author.username):
+                self.assertEqual(Follow.objects.get(
+                    author=post.author).last_pulled, post.pub_date)
+
+
+@override_settings(COMMENTS_PAGINATOR=5)
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.post = Post.objects.create(text='Тестовый текст', author=cls.user)
+        cls.comments = [
+            Comment.objects.create(
+                text=f'Комментарий {item}',
+                author=User.objects.create_user(username=f'reader_{item}'),
+                post=cls.post)
+            for item in range(8)
+        ]
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.post_url = reverse('post', args=['test_user', self.post.pk])
+        self.more_url = reverse(
+            'post_comments', args=['test_user', self.post.pk])
+
+    def test_post_page_shows_first_comments_with_more_link(self):
+        response = self.guest_client.get(self.post_url)
+        comments = response.context['comments']
+        self.assertEqual(list(comments), self.comments[:5])
+        self.assertContains(
+            response, f'{self.more_url}?cursor={comments.next_cursor}')
+
+    def test_more_comments_fragment_continues_after_cursor(self):
+        cursor = self.guest_client.get(
+            self.post_url).context['comments'].next_cursor
+        response = self.guest_client.get(self.more_url, {'cursor': cursor})
+        self.assertTemplateUsed(response, 'posts/comment_list.html')
+        self.assertEqual(list(response.context['comments']),
+                         self.comments[5:])
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_more_comments_as_json(self):
+        response = self.guest_client.get(self.more_url, {'format': 'json'})
+        data = response.json()
+        self.assertEqual([item['id'] for item in data['comments']],
+                         [comment.pk for comment in self.comments[:5]])
+        self.assertEqual(data['comments'][0]['author'], 'reader_0')
+        self.assertIsNotNone(data['next_cursor'])
+
+    def test_comment_authors_are_joined(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(self.more_url, {'format': 'json'})
+        self.assertEqual(len(queries), 2)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(title='Тест', slug='test-slug')
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.urls = (
+            reverse('index'),
+            reverse('group', args=['test-slug']),
+            reverse('profile', args=['test_user']),
+            reverse('post', args=['test_user', self.post.pk]),
+        )
+
+    def test_matching_etag_returns_304_without_post_queries(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertLessEqual(len(queries), 1)
+
+    def test_if_modified_since_returns_304(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                modified = self.guest_client.get(url)['Last-Modified']
+                response = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=modified)
+                self.assertEqual(response.status_code, 304)
+
+    def test_writes_in_one_second_change_last_modified(self):
+        with mock.patch.object(feed_cache, 'time') as clock:
+            clock.time.return_value = 1600000000.25
+            clock.time_ns.return_value = 1600000000250000000
+            modified = [self.guest_client.get(url)['Last-Modified']
+                        for url in self.urls]
+            Comment.objects.create(
+                text='Комментарий', author=self.user, post=self.post)
+            for url, since in zip(self.urls, modified):
+                with self.subTest(url=url):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=since)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_new_comment_changes_etag(self):
+        etags = [self.guest_client.get(url)['ETag'] for url in self.urls]
+        Comment.objects.create(
+            text='Комментарий', author=self.user, post=self.post)
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user_and_page(self):
+        url = reverse('index')
+        etag = self.guest_client.get(url)['ETag']
+        authorized_client = Client()
+        authorized_client.force_login(self.user)
+        self.assertNotEqual(authorized_client.get(url)['ETag'], etag)
+        self.assertNotEqual(
+            self.guest_client.get(url, {'page': 2})['ETag'], etag)
+
+    def test_follow_changes_profile_etag(self):
+        url = reverse('profile', args=['test_user'])
+        etag = self.guest_client.get(url)['ETag']
+        Follow.objects.follow(
+            User.objects.create_user(username='reader'), self.user)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Подписчиков: 1')
+
+
+class PageWindowTest(TestCase):
+    def test_window_keeps_ends_and_neighbours(self):
+        cases = (
+            (1, 5, [1, 2, 3, 4, 5]),
+            (1, 100, [1, 2, 3, None, 100]),
+            (50, 100, [1, None, 48, 49, 50, 51, 52, None, 100]),
+            (99, 100, [1, None, 97, 98, 99, 100]),
+        )
+        for number, num_pages, expected in cases:
+            with self.subTest(number=number, num_pages=num_pages):
+                self.assertEqual(page_window(number, num_pages), expected)
+
+    def test_paginator_html_does_not_grow_with_page_count(self):
+        user = User.objects.create_user(username='test_user')
+        Post.objects.create(text='Тестовый текст', author=user)
+        Counter.objects.filter(name=Counter.TOTAL_POSTS).update(
+            value=1_000_000)
+        cache.clear()
+        response = self.client.get(reverse('index'), {'page': 500})
+        self.assertContains(response, 'page=100000"')
+        self.assertContains(response, 'page=501"')
+        self.assertNotContains(response, 'page=600"')
+        self.assertEqual(response.content.decode().count('page-item'), 11)
+
+    def test_cursor_page_has_no_page_numbers(self):
+        user = User.objects.create_user(username='test_user')
+        Post.objects.bulk_create([
+            Post(text=f'Пост {item}', author=user) for item in range(11)
+        ])
+        response = self.client.get(reverse('index'), {'cursor': ''})
+        self.assertNotContains(response, 'page=')
+        self.assertContains(response, 'cursor=')
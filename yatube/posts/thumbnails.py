@@ -0,0 +1,199 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Шаблоны берут миниатюры через ``DeferredThumbnailBackend``: готовая
+миниатюра отдаётся из хранилища ключей sorl-thumbnail, а отсутствующая
+ставится в очередь и до готовности заменяется исходной картинкой.
+Размеры из ``THUMBNAIL_PRESETS`` строятся заранее, как только пост
+с картинкой сохранён.
+
+Для лент адреса миниатюр всей страницы достаются одним запросом
+к хранилищу ключей (``prefetch_thumbnail_urls``) и кладутся в
+``post.thumb_url``. Задание на миниатюру несёт ленты поста
+(``scopes``); когда воркер её достроил, эти ленты сбрасываются: их
+закешированные фрагменты ещё ссылаются на исходную картинку.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import feed_cache
+from .metrics import timed
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = {}
+_lock = threading.Lock()
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    def with_default_options(self, source, options):
+        """Те же умолчания, что подставляет ``ThumbnailBackend``, чтобы
+        имя миниатюры совпало с именем, под которым её сохранит воркер.
+        """
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault("format", self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, source, geometry_string, options):
+        name = self._get_thumbnail_filename(
+            source, geometry_string,
+            self.with_default_options(source, options))
+        return ImageFile(name, default.storage)
+
+    @timed("thumbnail")
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError("falsey file_ argument in get_thumbnail()")
+        source = ImageFile(file_)
+        cached = default.kvstore.get(
+            self.thumbnail_file(source, geometry_string, options))
+        if cached:
+            return cached
+        schedule(source.name, geometry_string, options)
+        return source
+
+
+class BulkKVStore(KVStore):
+    """Хранилище ключей sorl-thumbnail с пакетным чтением: одно обращение
+    к кешу и не больше одного запроса к базе на весь набор картинок.
+    """
+
+    def get_many(self, image_files):
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        if not keys:
+            return {}
+        values = self.cache.get_many(list(keys))
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = dict(KVStoreModel.objects.filter(
+                key__in=missing).values_list("key", "value"))
+            fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(
+                fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(fetched)
+        return {
+            keys[key]: deserialize_image_file(value)
+            for key, value in values.items() if value != EMPTY_VALUE
+        }
+
+
+def get_many(image_files):
+    kvstore = default.kvstore
+    if hasattr(kvstore, "get_many"):
+        return kvstore.get_many(image_files)
+    found = {}
+    for image_file in image_files:
+        cached = kvstore.get(image_file)
+        if cached:
+            found[image_file.key] = cached
+    return found
+
+
+@timed("thumbnail")
+def prefetch_thumbnail_urls(posts):
+    """Проставляет ``post.thumb_url`` миниатюры для карточки ленты.
+
+    Пока миниатюра не готова, в ``thumb_url`` лежит адрес исходной
+    картинки, а сама миниатюра ставится в очередь.
+    """
+    geometry_string, options = settings.FEED_THUMBNAIL
+    backend = DeferredThumbnailBackend()
+    thumbnails = []
+    for post in posts:
+        post.thumb_url = None
+        if post.image:
+            thumbnails.append((post, backend.thumbnail_file(
+                ImageFile(post.image), geometry_string, options)))
+    found = get_many([thumbnail for _, thumbnail in thumbnails])
+    for post, thumbnail in thumbnails:
+        cached = found.get(thumbnail.key)
+        if cached is None:
+            schedule(post.image.name, geometry_string, dict(options),
+                     feed_cache.post_scopes(post))
+            post.thumb_url = post.image.url
+        else:
+            post.thumb_url = cached.url
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix="thumbnails",
+            )
+        return _executor
+
+
+def render(name, geometry_string, options):
+    try:
+        ThumbnailBackend().get_thumbnail(name, geometry_string, **options)
+    except Exception:
+        logger.exception("Thumbnail %s for %s failed", geometry_string, name)
+
+
+def run_job(name, geometry_string, options, scopes=()):
+    try:
+        render(name, geometry_string, options)
+        if scopes:
+            feed_cache.invalidate(scopes)
+    finally:
+        # Соединение с базой у каждого потока своё, не держим его.
+        close_old_connections()
+
+
+def schedule(name, geometry_string, options, scopes=()):
+    """Ставит миниатюру в очередь; повторная постановка той же
+    миниатюры, пока она строится, ничего не делает. Ленты ``scopes``
+    сбрасываются, когда миниатюра готова.
+    """
+    if not settings.THUMBNAIL_ASYNC:
+        render(name, geometry_string, options)
+        return
+    key = (name, geometry_string, tuple(sorted(options.items())))
+    with _lock:
+        if key in _pending:
+            return
+        _pending[key] = None
+    future = get_executor().submit(
+        run_job, name, geometry_string, options, scopes)
+    with _lock:
+        if key in _pending:
+            _pending[key] = future
+    future.add_done_callback(lambda _: _pending.pop(key, None))
+
+
+def pregenerate(name, scopes=()):
+    for geometry_string, options in settings.THUMBNAIL_PRESETS:
+        schedule(name, geometry_string, dict(options), scopes)
+
+
+def pregenerate_on_commit(name, scopes=()):
+    transaction.on_commit(lambda: pregenerate(name, scopes))
+
+
+def wait_for_pending(timeout=None):
+    with _lock:
+        futures = [future for future in _pending.values() if future]
+    wait(futures, timeout=timeout)
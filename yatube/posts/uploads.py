@@ -0,0 +1,170 @@
+"""Приём картинок постов.
+
+``ImageUploadHandler`` пишет загрузку во временный файл по мере чтения
+и проверяет её на лету: размер в байтах — по каждому пришедшему куску,
+формат и число пикселей — по заголовку картинки, как только его первые
+килобайты дошли до сервера. Непрошедший проверку файл обрывает чтение
+запроса (``StopUpload``), причина лежит в ``request.upload_error``.
+
+Картинку в запросе не декодируют: view только переносит временный файл
+в ``IMAGE_UPLOAD_STAGING_DIR``, а после коммита фоновый воркер
+разворачивает её по EXIF, уменьшает до ``IMAGE_MAX_SIDE``,
+перекодирует без метаданных и прописывает посту.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import (StopUpload,
+                                             TemporaryFileUploadHandler)
+from django.db import close_old_connections, transaction
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import thumbnails
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Сколько байт ждать заголовка картинки: у фотографий с телефона
+# EXIF с превью идёт до размеров кадра и занимает десятки килобайт.
+HEADER_BYTES = 256 * 1024
+
+NOT_AN_IMAGE = "Загрузите картинку в формате {formats}."
+
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 85, "optimize": True},
+    "PNG": {"optimize": True},
+    "WEBP": {"quality": 85},
+}
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    too_big = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        # Тело запроса заведомо больше допустимой картинки и полей формы:
+        # файл отклоняется на первом же байте.
+        self.too_big = content_length > (
+            settings.IMAGE_UPLOAD_MAX_BYTES
+            + settings.DATA_UPLOAD_MAX_MEMORY_SIZE)
+
+    def new_file(self, *args, **kwargs):
+        self.file = None
+        if self.too_big:
+            self.reject_size()
+        super().new_file(*args, **kwargs)
+        self.header = b""
+        self.checked = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.IMAGE_UPLOAD_MAX_BYTES:
+            self.reject_size()
+        if not self.checked:
+            self.header += raw_data
+            self.check_header(final=False)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if not self.checked:
+            try:
+                self.check_header(final=True)
+            except StopUpload:
+                return None
+        return super().file_complete(file_size)
+
+    def check_header(self, final):
+        try:
+            with Image.open(BytesIO(self.header)) as image:
+                image_format, (width, height) = image.format, image.size
+        except Image.DecompressionBombError:
+            self.reject_pixels()
+        except UnidentifiedImageError:
+            if final or len(self.header) >= HEADER_BYTES:
+                self.reject_format()
+            return
+        if image_format not in settings.IMAGE_UPLOAD_FORMATS:
+            self.reject_format()
+        if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            self.reject_pixels()
+        self.checked = True
+        self.header = b""
+
+    def reject_size(self):
+        self.reject("Картинка больше {}.".format(
+            filesizeformat(settings.IMAGE_UPLOAD_MAX_BYTES)))
+
+    def reject_pixels(self):
+        self.reject("Картинка больше {:.0f} мегапикселей.".format(
+            settings.IMAGE_UPLOAD_MAX_PIXELS / 1e6))
+
+    def reject_format(self):
+        self.reject(NOT_AN_IMAGE.format(
+            formats=", ".join(settings.IMAGE_UPLOAD_FORMATS)))
+
+    def reject(self, message):
+        self.request.upload_error = message
+        if self.file is not None:
+            self.file.close()
+        raise StopUpload(connection_reset=True)
+
+
+def attach_on_commit(post, upload):
+    """Переносит загрузку в каталог необработанных картинок и после
+    коммита ставит её обработку в очередь.
+    """
+    name = default_storage.save(
+        os.path.join(settings.IMAGE_UPLOAD_STAGING_DIR, upload.name), upload)
+    transaction.on_commit(lambda: schedule(post.pk, name))
+
+
+def schedule(post_id, name):
+    if not settings.IMAGE_UPLOAD_ASYNC:
+        process(post_id, name)
+        return
+    thumbnails.get_executor().submit(run_job, post_id, name)
+
+
+def run_job(post_id, name):
+    try:
+        process(post_id, name)
+    finally:
+        close_old_connections()
+
+
+def reencode(source):
+    """Картинка, развёрнутая по EXIF, не больше IMAGE_MAX_SIDE по длинной
+    стороне и без метаданных, в исходном формате.
+    """
+    with Image.open(source) as image:
+        image_format = image.format
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((settings.IMAGE_MAX_SIDE, settings.IMAGE_MAX_SIDE))
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        output = BytesIO()
+        image.save(output, image_format,
+                   **SAVE_OPTIONS.get(image_format, {}))
+    return output.getvalue()
+
+
+def process(post_id, name):
+    try:
+        with default_storage.open(name) as source:
+            content = reencode(source)
+    except Exception:
+        logger.exception("Image %s for post %s failed", name, post_id)
+        return
+    finally:
+        default_storage.delete(name)
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        return
+    post.image = default_storage.save(
+        Post.image.field.generate_filename(post, os.path.basename(name)),
+        ContentFile(content))
+    post.save(update_fields=["image"])
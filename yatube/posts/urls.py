@@ -1,7 +1,7 @@
 from django.conf.urls import handler404, handler500  # noqa
 from django.urls import path
 
-from . import views
+from . import api, metrics, views
 
 handler404 = "posts.views.page_not_found"  # noqa
 handler500 = "posts.views.server_error"  # noqa
@@ -12,16 +12,37 @@ urlpatterns = [
         "<str:username>/<int:post_id>/edit/",
         views.post_edit,
         name="post_edit"),
+    path("export/<str:kind>/", views.export_data, name="export"),
+    path("search/", views.search, name="search"),
+    path("follow/", views.follow_index, name="follow_index"),
+    path("api/posts/", api.index, name="api_index"),
+    path("api/posts/<int:post_id>/", api.post_view, name="api_post"),
+    path("api/group/<slug:slug>/", api.group_posts, name="api_group"),
+    path("api/profile/<str:username>/", api.profile, name="api_profile"),
+    path("metrics/", metrics.metrics, name="metrics"),
     path("400/", views.page_not_found, name="not_found"),
     path("500/", views.server_error, name="server_error"),
 
     path("", views.index, name="index"),
     path("group/<slug:slug>/", views.group_posts, name="group"),
     path("<str:username>/", views.profile, name="profile"),
+    path(
+        "<str:username>/follow/",
+        views.profile_follow,
+        name="profile_follow"),
+    path(
+        "<str:username>/unfollow/",
+        views.profile_unfollow,
+        name="profile_unfollow"),
     path("<str:username>/<int:post_id>/", views.post_view, name="post"),
     path(
         "<str:username>/<int:post_id>/comment/",
         views.add_comment,
         name="add_comment"
     ),
+    path(
+        "<str:username>/<int:post_id>/comments/",
+        views.post_comments,
+        name="post_comments"
+    ),
 ]
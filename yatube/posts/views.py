@@ -1,74 +1,259 @@
+from datetime import datetime, timezone
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+
+from . import export, feed_cache, uploads
+from .forms import CommentForm, ImageForm, PostForm
+from .models import Counter, Follow, Group, Post, TimelineEntry, User
+from .paginators import (COMMENTS_ORDERING, CommentPaginator,
+                         CursorPaginator, get_page)
+from .query_budget import query_budget
+from .search import search_posts
+
+
+def get_items_paginator(request, item, item_per_page, count=None):
+    return get_page(request, item.posts.feed(), item_per_page, count)
+
+
+def feed_condition(get_scope):
+    """Условный GET для страниц лент: ETag и Last-Modified берутся
+    из версии ленты в кеше, и на совпавший If-None-Match или
+    If-Modified-Since отдаётся 304 до выборки постов и рендеринга.
+
+    ``get_scope(**kwargs)`` получает аргументы view и возвращает ленту
+    или None, если объекта нет (тогда ответ строит сам view).
+    """
+    def scope(request, **kwargs):
+        if not hasattr(request, "feed_scope"):
+            request.feed_scope = get_scope(**kwargs)
+        return request.feed_scope
 
-from .forms import CommentForm, PostForm
-from .models import Group, Post, User
+    def etag(request, *args, **kwargs):
+        feed_scope = scope(request, **kwargs)
+        if feed_scope is not None:
+            return feed_cache.get_etag(request, feed_scope)
+        return None
 
+    def last_modified(request, *args, **kwargs):
+        feed_scope = scope(request, **kwargs)
+        if feed_scope is not None:
+            return datetime.fromtimestamp(
+                feed_cache.get_modified(feed_scope), timezone.utc)
+        return None
 
-def get_items_paginator(request, item, item_per_page):
-    posts_list = item.posts.all()
-    paginator = Paginator(posts_list, item_per_page)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
-    return page
+    def decorator(view):
+        return vary_on_cookie(condition(etag, last_modified)(view))
+    return decorator
 
 
+def author_scope(username, **kwargs):
+    author_id = User.objects.filter(
+        username=username).values_list("pk", flat=True).first()
+    return author_id and feed_cache.profile_scope(author_id)
+
+
+def group_scope(slug):
+    group_id = Group.objects.filter(
+        slug=slug).values_list("pk", flat=True).first()
+    return group_id and feed_cache.group_scope(group_id)
+
+
+@query_budget(queries=5, time_ms=50)
+@feed_condition(lambda: feed_cache.INDEX)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.ELEMENTS_PAGINATOR)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
-    return render(request, "posts/index.html", {"page": page})
+    post_list = Post.objects.feed()
+    page = get_page(request, post_list, settings.ELEMENTS_PAGINATOR,
+                    Counter.objects.value(Counter.TOTAL_POSTS))
+    return render(
+        request,
+        "posts/index.html",
+        {"page": page, **feed_cache.feed_cache_context(feed_cache.INDEX)}
+    )
 
 
+def search(request):
+    query = request.GET.get("q", "").strip()
+    paginator = Paginator(search_posts(query), settings.ELEMENTS_PAGINATOR)
+    page = paginator.get_page(request.GET.get("page"))
+    return render(
+        request,
+        "posts/search.html",
+        {"page": page, "query": query,
+         "paginator_query": urlencode({"q": query}) + "&"}
+    )
+
+
+@query_budget(queries=6, time_ms=50)
+@feed_condition(group_scope)
 def group_posts(request, slug):
     """Функция get_object_or_404 получает по заданным критериям
     объект из базы данных или возвращает сообщение об ошибке,
     если объект не найден.
     """
     group = get_object_or_404(Group, slug=slug)
-    page = get_items_paginator(request, group, settings.ELEMENTS_PAGINATOR)
-    return render(request, "posts/group.html", {"group": group, "page": page})
+    page = get_items_paginator(request, group, settings.ELEMENTS_PAGINATOR,
+                               group.posts_count)
+    return render(
+        request,
+        "posts/group.html",
+        {"group": group, "page": page,
+         **feed_cache.feed_cache_context(feed_cache.group_scope(group.pk))}
+    )
 
 
+def get_author_context(request, author):
+    """Счётчики для карточки автора — одним запросом к Counter,
+    без COUNT(*) по постам и подпискам.
+    """
+    names = {
+        "posts_count": Counter.author_posts(author.pk),
+        "followers_count": Counter.author_followers(author.pk),
+        "follows_count": Counter.user_follows(author.pk),
+    }
+    values = Counter.objects.value_many(names.values())
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author).exists()
+    return {
+        "following": following,
+        **{key: values[name] for key, name in names.items()},
+    }
+
+
+@query_budget(queries=8, time_ms=50)
+@feed_condition(author_scope)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    page = get_items_paginator(request, author, settings.ELEMENTS_PAGINATOR)
-    return render(request, "profile.html", {"author": author, "page": page})
+    author_context = get_author_context(request, author)
+    page = get_items_paginator(request, author, settings.ELEMENTS_PAGINATOR,
+                               author_context["posts_count"])
+    return render(
+        request,
+        "profile.html",
+        {"author": author, "page": page, **author_context,
+         **feed_cache.feed_cache_context(
+             feed_cache.profile_scope(author.pk))}
+    )
+
 
+def get_comments_page(request, post):
+    paginator = CommentPaginator(
+        post.comments.select_related("author").order_by(*COMMENTS_ORDERING),
+        settings.COMMENTS_PAGINATOR)
+    return paginator.get_cursor_page(request.GET.get("cursor"))
 
+
+@query_budget(queries=9, time_ms=50)
+@feed_condition(author_scope)
 def post_view(request, username, post_id):
     author = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, author=author, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related("author"), author=author, pk=post_id)
+    comments = get_comments_page(request, post)
     form = CommentForm()
     return render(
         request,
         "posts/post.html",
-        {"author": author, "post": post, "comments": comments, "form": form}
+        {"author": author, "post": post, "comments": comments, "form": form,
+         **get_author_context(request, author)}
+    )
+
+
+@query_budget(queries=4, time_ms=50)
+def post_comments(request, username, post_id):
+    """Следующая порция комментариев к посту для «Показать ещё»:
+    HTML-фрагмент или, с ?format=json, JSON.
+    """
+    post = get_object_or_404(
+        Post.objects.select_related("author"),
+        author__username=username, pk=post_id)
+    comments = get_comments_page(request, post)
+    if request.GET.get("format") == "json":
+        return JsonResponse({
+            "comments": [
+                {"id": comment.pk,
+                 "author": comment.author.username,
+                 "text": comment.text,
+                 "created": comment.created}
+                for comment in comments
+            ],
+            "next_cursor": comments.next_cursor,
+        }, json_dumps_params={"ensure_ascii": False})
+    return render(
+        request,
+        "posts/comment_list.html",
+        {"post": post, "comments": comments}
     )
 
 
+@query_budget(queries=8, time_ms=50)
+@login_required
+def follow_index(request):
+    """Лента подписок: посты лежат в персональной ленте пользователя,
+    страница читается одним проходом по индексу ленты. Страницы идут
+    по курсору: COUNT(*) по всей ленте не нужен.
+    """
+    TimelineEntry.objects.pull(request.user)
+    entries = TimelineEntry.objects.filter(user=request.user).feed()
+    paginator = CursorPaginator(entries, settings.ELEMENTS_PAGINATOR)
+    page = paginator.get_cursor_page(request.GET.get("cursor"))
+    return render(request, "posts/follow.html", {"page": page})
+
+
+@login_required
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    Follow.objects.follow(request.user, author)
+    return redirect("profile", username=username)
+
+
+@login_required
+def profile_unfollow(request, username):
+    author = get_object_or_404(User, username=username)
+    Follow.objects.unfollow(request.user, author)
+    return redirect("profile", username=username)
+
+
+def get_image_form(request):
+    if request.method != "POST":
+        return ImageForm()
+    return ImageForm(request.POST, request.FILES,
+                     upload_error=getattr(request, "upload_error", None))
+
+
+def save_image(post, image_form):
+    """Картинка попадёт в пост после фоновой перекодировки."""
+    upload = image_form.cleaned_data["image"]
+    if upload is not None:
+        uploads.attach_on_commit(post, upload)
+
+
 @login_required
 def new_post(request):
     if request.method == "POST":
         form = PostForm(request.POST or None, files=request.FILES or None)
-        if form.is_valid():
+        image_form = get_image_form(request)
+        if form.is_valid() and image_form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            save_image(post, image_form)
             return redirect("index")
         return render(
             request,
             "users/new_post.html",
-            {"form": form, "switch": "new"})
+            {"form": form, "image_form": image_form, "switch": "new"})
     form = PostForm()
     return render(
         request,
         "users/new_post.html",
-        {"form": form, "switch": "new"})
+        {"form": form, "image_form": ImageForm(), "switch": "new"})
 
 
 @login_required
@@ -79,17 +264,20 @@ def post_edit(request, username, post_id):
         return redirect('post', username=username, post_id=post_id)
     form = PostForm(request.POST or None, files=request.FILES or None,
                     instance=post)
+    image_form = get_image_form(request)
 
     if request.method == 'POST':
-        if form.is_valid():
+        if form.is_valid() and image_form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            save_image(post, image_form)
             return redirect("post", username=request.user.username,
                             post_id=post_id)
 
     return render(
-        request, 'users/new_post.html', {'form': form, 'post': post},
+        request, 'users/new_post.html',
+        {'form': form, 'image_form': image_form, 'post': post},
     )
 
 
@@ -111,7 +299,6 @@ def add_comment(request, username, post_id):
     author = get_object_or_404(User, username=username)
     post = get_object_or_404(Post, author=author, pk=post_id)
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
@@ -125,5 +312,27 @@ def add_comment(request, username, post_id):
     return render(
         request,
         "posts/comments.html",
-        {"form": form, "comments": comments}
+        {"form": form, "post": post,
+         "comments": get_comments_page(request, post)}
+    )
+
+
+@login_required
+def export_data(request, kind):
+    """Потоковая выгрузка постов или комментариев: ?format=jsonl|csv,
+    ?after=<id> продолжает выгрузку с места обрыва.
+    """
+    fmt = request.GET.get("format", "jsonl")
+    if kind not in export.EXPORTS or fmt not in export.FORMATS:
+        raise Http404
+    try:
+        after_id = int(request.GET.get("after", 0))
+    except ValueError:
+        after_id = 0
+    response = StreamingHttpResponse(
+        export.iter_lines(kind, fmt, after_id),
+        content_type=f"{export.CONTENT_TYPES[fmt]}; charset=utf-8",
     )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{kind}.{fmt}"')
+    return response
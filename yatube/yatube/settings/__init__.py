@@ -0,0 +1,9 @@
+"""Профиль настроек выбирается переменной окружения YATUBE_PROFILE:
+dev (по умолчанию) или production.
+"""
+import os
+
+if os.environ.get('YATUBE_PROFILE', 'dev') == 'production':
+    from .production import *  # noqa: F401,F403
+else:
+    from .base import *  # noqa: F401,F403
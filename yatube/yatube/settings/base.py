@@ -0,0 +1,197 @@
+import os
+
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SECRET_KEY = '3tm+kv3w*_k%t+e^+&acipi%+=r3x-4^d9ga6w+v-^fheev(9_'
+
+DEBUG = True
+
+ELEMENTS_PAGINATOR = 10
+COMMENTS_PAGINATOR = 20
+
+ALLOWED_HOSTS = [
+    "localhost",
+    "127.0.0.1",
+    "[::1]",
+    "testserver",
+]
+
+INSTALLED_APPS = [
+    'users',
+    'posts.apps.PostsConfig',
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'sorl.thumbnail',
+]
+
+MIDDLEWARE = [
+    'posts.slow_requests.SlowRequestProfilerMiddleware',
+    'posts.query_budget.QueryBudgetMiddleware',
+    'posts.metrics.MetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+TEMPLATES = [
+    {
+        'BACKEND': 'posts.metrics.DjangoTemplates',
+        'DIRS': [TEMPLATES_DIR],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+
+# Ожидание блокировки записи в SQLite, секунды.
+SQLITE_BUSY_TIMEOUT = 20
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'yatube.sqlite3',
+        'NAME': os.environ.get(
+            'YATUBE_DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT,
+        },
+    }
+}
+
+# Миграции созданы с AutoField. Без явного значения Django 3.2
+# предупреждает об этом (models.W042) при каждом запуске.
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
+# PRAGMA, которые выполняются на каждом новом соединении с SQLite.
+# WAL: читатели не ждут писателя и наоборот; synchronous=NORMAL в режиме
+# WAL не теряет целостность, fsync делается только на контрольной точке.
+# cache_size в минусах — килобайты, а не страницы.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, "static")
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Картинки постов проверяются при приёме и перекодируются в фоне
+FILE_UPLOAD_HANDLERS = ['posts.uploads.ImageUploadHandler']
+IMAGE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40 * 1000 * 1000
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+IMAGE_UPLOAD_STAGING_DIR = 'uploads'
+IMAGE_UPLOAD_ASYNC = True
+IMAGE_MAX_SIDE = 2560
+
+
+LOGIN_URL = '/auth/login/'
+LOGIN_REDIRECT_URL = 'index'
+
+
+EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
+
+# Общий для всех воркеров кеш выбирается переменными окружения:
+# YATUBE_CACHE=file (каталог YATUBE_CACHE_LOCATION)
+# или YATUBE_CACHE=memcached (адрес host:port в YATUBE_CACHE_LOCATION).
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+}
+CACHE_DEFAULT_LOCATIONS = {
+    'locmem': '',
+    'file': os.path.join(BASE_DIR, 'cache'),
+    'memcached': '127.0.0.1:11211',
+}
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE', 'locmem')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', CACHE_DEFAULT_LOCATIONS[CACHE_BACKEND]),
+    }
+}
+
+FEED_CACHE_TIMEOUT = 60 * 5
+
+# Миниатюры строятся в фоне, шаблоны их только читают.
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+THUMBNAIL_KVSTORE = 'posts.thumbnails.BulkKVStore'
+FEED_THUMBNAIL = ('960x339', {'crop': 'center', 'upscale': True})
+THUMBNAIL_PRESETS = (
+    FEED_THUMBNAIL,
+)
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_ASYNC = True
+
+# Посты авторов, у которых подписчиков меньше FOLLOW_FAN_OUT_LIMIT,
+# раскладываются по лентам подписчиков при публикации; посты остальных
+# подписчики подтягивают сами при чтении ленты.
+FOLLOW_FAN_OUT_LIMIT = 1000
+TIMELINE_BACKFILL = 200
+
+# Превышение бюджета запросов view: исключение или предупреждение в лог
+QUERY_BUDGET_RAISE = DEBUG
+
+# Стеки запросов дольше SLOW_REQUEST_THRESHOLD секунд пишутся в каталог
+# SLOW_REQUEST_PROFILE_DIR; без каталога профилировщик выключен.
+SLOW_REQUEST_PROFILE_DIR = os.environ.get('YATUBE_SLOW_REQUEST_DIR')
+SLOW_REQUEST_THRESHOLD = float(
+    os.environ.get('YATUBE_SLOW_REQUEST_THRESHOLD', 1))
+SLOW_REQUEST_SAMPLE_INTERVAL = 0.005
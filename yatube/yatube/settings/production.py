@@ -0,0 +1,46 @@
+"""Настройки для продакшена: YATUBE_PROFILE=production.
+
+Секреты и адреса берутся из окружения, соединения с базой живут между
+запросами, шаблоны разбираются один раз на процесс.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import ALLOWED_HOSTS, DATABASES, TEMPLATES
+
+DEBUG = False
+
+# Превышение бюджета запросов только пишется в лог.
+QUERY_BUDGET_RAISE = False
+
+# Ключ из base.py лежит в репозитории, в продакшене он недопустим.
+SECRET_KEY = os.environ.get('YATUBE_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Не задана переменная YATUBE_SECRET_KEY')
+
+if os.environ.get('YATUBE_ALLOWED_HOSTS'):
+    ALLOWED_HOSTS = os.environ['YATUBE_ALLOWED_HOSTS'].split(',')
+
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_CONN_MAX_AGE', 600)),
+    }
+}
+
+# Шаблоны разбираются один раз на процесс, а не на каждый запрос.
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
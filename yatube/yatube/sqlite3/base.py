@@ -0,0 +1,21 @@
+"""Бэкенд SQLite, который открывает транзакции через BEGIN IMMEDIATE.
+
+Обычный BEGIN откладывает блокировку записи до первого изменения.
+Если к этому моменту другой писатель уже закоммитил, SQLite сразу
+отвечает «database is locked», не дожидаясь таймаута. BEGIN IMMEDIATE
+берёт блокировку в начале транзакции, и конкурирующие транзакции
+ждут друг друга в пределах таймаута.
+"""
+from django.db.backends.sqlite3 import base, features
+
+
+class DatabaseFeatures(features.DatabaseFeatures):
+    # Открытая транзакция уже держит блокировку записи.
+    locks_on_begin = True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    features_class = DatabaseFeatures
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE")